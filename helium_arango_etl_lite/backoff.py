@@ -0,0 +1,18 @@
+import random
+
+
+class Backoff(object):
+    # exponential backoff with full jitter, doubling from `initial` to `maximum`
+    def __init__(self, initial: float, maximum: float, factor: float = 2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self._ceiling = initial
+
+    def next(self) -> float:
+        delay = random.uniform(self._ceiling / 2, self._ceiling)
+        self._ceiling = min(self._ceiling * self.factor, self.maximum)
+        return delay
+
+    def reset(self):
+        self._ceiling = self.initial
@@ -0,0 +1,84 @@
+# End-to-end blocks/s, docs/s, per-stage latency and peak memory of Follower.process_block against a local fake node
+# (benchmarks.fake_node) and an in-process Arango sink (benchmarks.null_arango), per block profile.
+# Run from the helium_arango_etl_lite directory: python -m benchmarks.bench_follower [blocks] [latency_ms]
+# Client settings are read from the environment as usual, e.g. RPC_CONCURRENCY=8 RPC_BATCH_SIZE=50 PARSE_MODE=fast
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+from benchmarks.fixtures import PROFILES
+
+START_HEIGHT = 1000000
+
+
+def percentiles(samples: List[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    return f"p50 {statistics.median(ms):7.2f} ms, p95 {ms[int(len(ms) * 0.95)]:7.2f} ms"
+
+
+def run(profile: str, blocks: int, latency_s: float):
+    # executed in a fresh interpreter per profile so ru_maxrss only reflects that profile
+    from benchmarks.fake_node import FakeNode
+    from benchmarks.null_arango import NullConnection
+
+    node = FakeNode.synthetic(profile, START_HEIGHT, blocks, latency_s).start()
+    os.environ.update({"NODE_ADDRESS": node.address, "ARANGO_DATABASE": "bench", "GATEWAY_INVENTORY_PATH": "",
+                       "GATEWAY_INVENTORY_BOOTSTRAP": "False", "BLOCK_INVENTORY_SIZE": str(blocks)})
+    from follower import Follower
+    from settings import Settings
+    import metrics
+
+    follower = Follower(settings=Settings(), connection=NullConnection())
+    follower.init_database()
+    follower.first_block = follower.sync_height = START_HEIGHT
+
+    fetch, transform, write = [], [], []
+    documents = 0
+    t = time.perf_counter()
+    for height in range(START_HEIGHT, START_HEIGHT + blocks):
+        t0 = time.perf_counter()
+        block, txns, transactions = follower.fetch_block(height)
+        t1 = time.perf_counter()
+        output = follower.transform_block(block, txns, transactions)
+        t2 = time.perf_counter()
+        documents += sum(len(docs) for docs in output.values())
+        follower.write_documents(output)
+        follower.sync_height = height + 1
+        follower.writer.flush_if_due()
+        fetch.append(t1 - t0)
+        transform.append(t2 - t1)
+        write.append(time.perf_counter() - t2)
+    t3 = time.perf_counter()
+    follower.writer.flush()
+    write[-1] += time.perf_counter() - t3
+    seconds = time.perf_counter() - t
+    node.stop()
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    imported = {name: follower.database[name].stats for name in ["payments", "accounts", "poc_receipts"]}
+    print(f"{profile:>8}: {blocks / seconds:8.1f} blocks/s, {documents / seconds:10,.0f} docs/s, "
+          f"{node.requests} HTTP requests, peak RSS {peak_mb:,.0f} MB")
+    print(f"{'':>10}fetch     {percentiles(fetch)}")
+    print(f"{'':>10}transform {percentiles(transform)}")
+    print(f"{'':>10}write     {percentiles(write)}")
+    print(f"{'':>10}imported  " + ", ".join(f"{name} {s['created']} (+{s['ignored']} ignored)"
+                                            for name, s in imported.items()))
+    # synthetic blocks are linked, so a break means the benchmark measured the chain-break path instead
+    chain_breaks = sum(metrics.CHAIN_BREAKS.values.values())
+    assert chain_breaks == 0, f"{chain_breaks} synthetic blocks didn't link to the block before them"
+
+
+def main(blocks: int = 50, latency_ms: float = 0.0):
+    for profile in PROFILES:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_follower", "--run", profile, str(blocks),
+                        str(latency_ms / 1000)], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        main(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:])))
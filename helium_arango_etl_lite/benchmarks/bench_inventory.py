@@ -0,0 +1,58 @@
+# Throughput / peak memory of the gateway inventory loader on a synthetic inventory.
+# Run from the helium_arango_etl_lite directory: python -m benchmarks.bench_inventory [rows]
+import csv
+import gzip
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import h3
+from loaders import InventoryFingerprints, process_gateway_inventory
+
+
+def write_inventory(path: Path, rows: int):
+    random.seed(0)
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["address", "owner", "location", "first_block", "last_block", "nonce", "name", "elevation",
+                         "gain", "mode", "payer"])
+        for i in range(rows):
+            location = h3.geo_to_h3(random.uniform(-60, 70), random.uniform(-180, 180), 12)
+            writer.writerow([
+                f"11x{i:048d}", f"13x{i % 5000:048d}",
+                location if i % 50 else "",  # some hotspots never asserted a location
+                random.randint(1, 1300000), 1300000, random.randint(1, 5), f"hotspot-{i}",
+                random.randint(0, 100), random.choice([12, 23, 40, 58]), "full", f"14x{i % 200:048d}"
+            ])
+
+
+def run(path: str, chunksize: int):
+    # executed in a fresh interpreter per mode so ru_maxrss only reflects that mode
+    t = time.time()
+    stats = {}
+    batches = 0
+    for _ in process_gateway_inventory(path, InventoryFingerprints(None), chunksize or None, stats):
+        batches += 1
+    seconds = time.time() - t
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"chunksize={chunksize or 'full'}: {stats['rows'] / seconds:,.0f} rows/s, {batches} batches, "
+          f"{stats['imported']} records, peak RSS {peak_mb:,.0f} MB")
+
+
+def main(rows: int = 1000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "gateway_inventory_1.csv.gz"
+        write_inventory(path, rows)
+        for chunksize in [0, 50000]:
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_inventory", "--run", str(path), str(chunksize)],
+                           check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(*(int(arg) for arg in sys.argv[1:]))
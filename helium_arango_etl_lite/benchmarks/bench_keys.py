@@ -0,0 +1,34 @@
+# Micro-benchmark of the edge _key schemes.
+# Run from the helium_arango_etl_lite directory: python -m benchmarks.bench_keys
+import timeit
+from transform import get_hash_of_dict, receipt_key
+
+
+def receipt_document(i: int) -> dict:
+    return {
+        "_from": "hotspots/11" + "a" * 49,
+        "_to": f"hotspots/11{i:049d}",
+        "frequency": 904.6,
+        "datarate": "SF9BW125",
+        "is_valid": True,
+        "signal": -110,
+        "snr": -4.5,
+        "timestamp": 1650000000000000000 + i,
+        "hash": "b" * 43,
+        "block": 1300000,
+        "tx_power": 27,
+        "processing_time_s": 0.25
+    }
+
+
+def main(n: int = 100000):
+    documents = [receipt_document(i) for i in range(n)]
+    old = timeit.timeit(lambda: [get_hash_of_dict(d) for d in documents], number=1)
+    new = timeit.timeit(lambda: [receipt_key(d["hash"], d["_to"][9:]) for d in documents], number=1)
+    print(f"md5(json.dumps(sort_keys=True)): {n / old:,.0f} keys/s ({old / n * 1e6:.2f} us/key)")
+    print(f"versioned blake2b identity key:  {n / new:,.0f} keys/s ({new / n * 1e6:.2f} us/key)")
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
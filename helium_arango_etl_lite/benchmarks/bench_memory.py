@@ -0,0 +1,98 @@
+# In-flight memory and serialization cost of a block's documents: per-document dicts serialized twice (once for the
+# write buffer's byte count, once more by importBulk) versus edges.Edge records encoded once into the JSONL payload.
+# Run from the helium_arango_etl_lite directory: python -m benchmarks.bench_memory [blocks] [recorded_fixtures_dir]
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+from edges import Edge, encode
+from models.records import BlockRecord
+from transform import build_block_documents
+from transformers import TRANSFORMERS
+from benchmarks.fixtures import synthetic_block, load_recorded
+
+
+def documents_of(fixture) -> Dict[str, List]:
+    block_raw, transactions_raw = fixture
+    block = BlockRecord(block_raw)
+    txns = [txn for txn in block.transactions if txn.type in TRANSFORMERS]
+    transactions = [TRANSFORMERS[txn.type].record(transactions_raw[txn.hash]) for txn in txns]
+    return build_block_documents(block.height, block.time, txns, transactions)
+
+
+def as_dicts(documents: Dict[str, List]) -> Dict[str, List[dict]]:
+    return {c: [d.to_dict() if isinstance(d, Edge) else d for d in docs] for c, docs in documents.items()}
+
+
+def retained(build) -> (object, int, int):
+    # (result, bytes, allocations) still held by the result of build() once temporaries are gone
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics("filename")
+    return result, sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def serialize_twice(documents: Dict[str, List[dict]]) -> int:
+    # the old WriteBuffer.add byte count plus pyArango's importBulk body
+    size = 0
+    for docs in documents.values():
+        size += sum(len(json.dumps(doc)) for doc in docs)
+        json.dumps(docs, default=str)
+    return size
+
+
+def serialize_once(documents: Dict[str, List]) -> int:
+    size = 0
+    for docs in documents.values():
+        payload = bytearray()
+        for doc in docs:
+            payload += encode(doc)
+            payload += b"\n"
+        size += len(payload)
+    return size
+
+
+def bench(name: str, fixtures):
+    blocks = len(fixtures)
+    # both representations hold the same strings, so the difference is the per-document containers
+    records, record_bytes, record_allocations = retained(lambda: [documents_of(f) for f in fixtures])
+    del records
+    dicts, dict_bytes, dict_allocations = retained(lambda: [as_dicts(documents_of(f)) for f in fixtures])
+    records = [documents_of(f) for f in fixtures]
+    edges = sum(len(docs) for output in records for c, docs in output.items() if c not in ["accounts", "hotspots"])
+    per = max(edges, 1)
+
+    t = time.perf_counter()
+    for output in dicts:
+        serialize_twice(output)
+    twice = time.perf_counter() - t
+    t = time.perf_counter()
+    payload = sum(serialize_once(output) for output in records)
+    once = time.perf_counter() - t
+
+    print(f"{name:>8}: {edges / blocks:,.0f} edges/block")
+    print(f"{'':>10}dicts   {dict_bytes / per:7.0f} bytes/edge, {dict_allocations / blocks:9,.0f} allocations/block, "
+          f"serialized twice in {twice / blocks * 1000:7.2f} ms/block")
+    print(f"{'':>10}records {record_bytes / per:7.0f} bytes/edge, {record_allocations / blocks:9,.0f} allocations/block, "
+          f"serialized once in  {once / blocks * 1000:7.2f} ms/block")
+    print(f"{'':>10}import payload {payload / per:.0f} bytes/edge (held by the write buffer instead of the documents "
+          f"unless a sink reads the collection)")
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    if len(sys.argv) > 2:
+        bench("recorded", load_recorded(sys.argv[2]))
+        return
+    for profile in ["poc", "payment"]:
+        bench(profile, [synthetic_block(h, profile) for h in range(1000000, 1000000 + blocks)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Strict (pydantic) vs fast (__slots__ record) decoding of node responses, including building the documents.
+# Run from the helium_arango_etl_lite directory: python -m benchmarks.bench_parse [recorded_fixtures_dir]
+import json
+import sys
+import time
+from client import parse_transaction
+from models.block import Block
+from models.records import BlockRecord
+from transform import build_block_documents
+from transformers import TRANSFORMERS
+from benchmarks.fixtures import PROFILES, synthetic_block, load_recorded
+
+
+def decode(fixture, strict: bool):
+    # from response bytes, as the client sees them
+    block_bytes, transaction_bytes = fixture
+    block_raw = json.loads(block_bytes)
+    block = Block.parse_obj(block_raw) if strict else BlockRecord(block_raw)
+    txns = [txn for txn in block.transactions if txn.type in TRANSFORMERS]
+    transactions = []
+    for txn in txns:
+        raw = json.loads(transaction_bytes[txn.hash])
+        transactions.append(parse_transaction(raw, txn.type) if strict else TRANSFORMERS[txn.type].record(raw))
+    return build_block_documents(block.height, block.time, txns, transactions)
+
+
+def bench(name: str, fixtures, repeat: int = 3):
+    encoded = [(json.dumps(block), {h: json.dumps(t) for h, t in transactions.items()})
+               for block, transactions in fixtures]
+    results = {}
+    for mode, strict in [("strict", True), ("fast", False)]:
+        best = float("inf")
+        for _ in range(repeat):
+            t = time.perf_counter()
+            documents = [decode(fixture, strict) for fixture in encoded]
+            best = min(best, time.perf_counter() - t)
+        results[mode] = (best, documents)
+    assert results["strict"][1] == results["fast"][1], "fast mode produced different documents"
+    strict_s, fast_s = results["strict"][0], results["fast"][0]
+    print(f"{name:>8}: strict {len(fixtures) / strict_s:8.1f} blocks/s, fast {len(fixtures) / fast_s:8.1f} blocks/s "
+          f"({strict_s / fast_s:.1f}x)")
+
+
+def main():
+    if len(sys.argv) > 1:
+        bench("recorded", load_recorded(sys.argv[1]))
+        return
+    for profile in PROFILES:
+        bench(profile, [synthetic_block(h, profile) for h in range(1000000, 1000020)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Local stand-in for blockchain-node's JSON-RPC API (block_height, block_get, transaction_get, single and batch
+# requests) serving synthetic or recorded blocks, with optional injected latency per HTTP request.
+# Standalone: python -m benchmarks.fake_node <profile|recorded_fixtures_dir> [blocks] [latency_ms] [port]
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from benchmarks.fixtures import PROFILES, synthetic_block, load_recorded
+
+
+class FakeNode(object):
+    def __init__(self, fixtures: List[Tuple[dict, Dict[str, dict]]], latency_s: float = 0.0, port: int = 0):
+        self.blocks: Dict[int, dict] = {}
+        self.blocks_by_hash: Dict[str, dict] = {}
+        self.transactions: Dict[str, dict] = {}
+        for block, transactions in fixtures:
+            self.blocks[block["height"]] = block
+            self.blocks_by_hash[block["hash"]] = block
+            self.transactions.update(transactions)
+        self.latency_s = latency_s
+        self.requests = 0
+        self.calls = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def synthetic(cls, profile: str, start: int, blocks: int, latency_s: float = 0.0, port: int = 0) -> "FakeNode":
+        return cls([synthetic_block(h, profile) for h in range(start, start + blocks)], latency_s, port)
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def height(self) -> int:
+        return max(self.blocks) if self.blocks else 0
+
+    def start(self) -> "FakeNode":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-node", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def dispatch(self, call: dict) -> dict:
+        self.calls += 1
+        method, params = call.get("method"), call.get("params") or {}
+        result = None
+        if method == "block_height":
+            result = self.height
+        elif method == "block_get":
+            result = self.blocks.get(params["height"]) if "height" in params else self.blocks_by_hash.get(params.get("hash"))
+        elif method == "transaction_get":
+            result = self.transactions.get(params.get("hash"))
+        else:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        if result is None:
+            # what the node answers for unknown blocks / transactions
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -100, "message": "not_found"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def _handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                # headers and body go out as separate writes; don't let Nagle + delayed ACK add ~40 ms per request
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.requests += 1
+                if node.latency_s:
+                    time.sleep(node.latency_s)
+                if isinstance(request, list):
+                    response = [node.dispatch(call) for call in request]
+                else:
+                    response = node.dispatch(request)
+                body = json.dumps(response).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python -m benchmarks.fake_node <profile|recorded_fixtures_dir> [blocks] [latency_ms] [port]")
+        return
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency_s = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0
+    port = int(sys.argv[4]) if len(sys.argv) > 4 else 4467
+    if sys.argv[1] in PROFILES:
+        node = FakeNode.synthetic(sys.argv[1], 1000000, blocks, latency_s, port)
+    elif Path(sys.argv[1]).is_dir():
+        node = FakeNode(load_recorded(sys.argv[1]), latency_s, port)
+    else:
+        raise Exception(f"Unexpected block profile: {sys.argv[1]}")
+    print(f"Serving blocks {min(node.blocks)}-{node.height} on {node.address}")
+    node._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# In-process stand-in for the parts of pyArango the follower uses; keeps only document keys, to count duplicates.
+import json
+import time
+from typing import Dict, List, Optional
+from pyArango.theExceptions import CreationError, DocumentNotFoundError
+
+
+class NullDocument(object):
+    def __init__(self, collection: "NullCollection", data: dict):
+        self.collection = collection
+        self.data = data
+
+    def save(self, **kwargs):
+        self.collection.documents[self.data["_key"]] = dict(self.data)
+
+
+class NullResponse(object):
+    def __init__(self, status_code: int, data: Dict):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self) -> Dict:
+        return self.data
+
+
+class NullSession(object):
+    def __init__(self, connection: "NullConnection"):
+        self.connection = connection
+
+    def get(self, url: str, params: Dict = None, **kwargs) -> NullResponse:
+        database, _, endpoint = url[len("null://"):].partition("/")
+        if endpoint != "index":
+            raise NotImplementedError(url)
+        collection = self.connection.databases[database][params["collection"]]
+        return NullResponse(200, {"error": False, "code": 200, "indexes": list(collection.indexes)})
+
+    def delete(self, url: str, **kwargs) -> NullResponse:
+        database, _, endpoint = url[len("null://"):].partition("/")
+        if not endpoint.startswith("index/"):
+            raise NotImplementedError(url)
+        index_id = endpoint[len("index/"):]
+        collection = self.connection.databases[database][index_id.partition("/")[0]]
+        collection.indexes = [infos for infos in collection.indexes if infos["id"] != index_id]
+        return NullResponse(200, {"error": False, "code": 200, "id": index_id})
+
+    def post(self, url: str, params: Dict = None, data: bytes = b"", **kwargs) -> NullResponse:
+        database, _, endpoint = url[len("null://"):].partition("/")
+        if endpoint != "import" or params.get("type") != "documents":
+            raise NotImplementedError(url)
+        collection = self.connection.databases[database][params["collection"]]
+        t = time.perf_counter()
+        documents = [json.loads(line) for line in data.splitlines() if line]
+        collection.seconds += time.perf_counter() - t
+        return NullResponse(201, collection.import_documents(documents, len(data)))
+
+
+class NullCollection(object):
+    def __init__(self, name: str, database: "NullDatabase", edges: bool = False):
+        self.name = name
+        self.database = database
+        self.connection = database.connection
+        self.indexes: List[Dict] = [{"id": f"{name}/0", "type": "primary", "fields": ["_key"], "unique": True,
+                                     "sparse": False, "name": "primary"}]
+        if edges:
+            self.indexes.append({"id": f"{name}/1", "type": "edge", "fields": ["_from", "_to"], "unique": False,
+                                 "sparse": False, "name": "edge"})
+        self.keys = set()
+        self.documents: Dict[str, dict] = {}
+        self.imports = 0
+        self.created = 0
+        self.ignored = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def importBulk(self, data: List[dict], **params) -> Dict:
+        t = time.perf_counter()
+        size = len(json.dumps(data))
+        self.seconds += time.perf_counter() - t
+        return self.import_documents(data, size)
+
+    def import_documents(self, data: List[dict], size: int) -> Dict:
+        t = time.perf_counter()
+        self.bytes += size
+        created = 0
+        for doc in data:
+            if doc["_key"] not in self.keys:
+                self.keys.add(doc["_key"])
+                created += 1
+        self.imports += 1
+        self.created += created
+        self.ignored += len(data) - created
+        self.seconds += time.perf_counter() - t
+        return {"error": False, "created": created, "errors": 0, "empty": 0, "updated": 0,
+                "ignored": len(data) - created}
+
+    def createDocument(self, initDict: Optional[dict] = None) -> NullDocument:
+        return NullDocument(self, initDict or {})
+
+    def fetchDocument(self, key: str, **kwargs) -> dict:
+        if key not in self.documents:
+            raise DocumentNotFoundError(f"{self.name}/{key} not found")
+        return self.documents[key]
+
+    def count(self) -> int:
+        return len(self.keys) + len(self.documents)
+
+    def ensureIndex(self, index_type, fields, name=None, **index_args):
+        next_id = max(int(infos["id"].partition("/")[2]) for infos in self.indexes) + 1
+        infos = {"id": f"{self.name}/{next_id}", "type": index_type, "fields": list(fields),
+                 "name": name, "unique": False, "sparse": False}
+        infos.update(index_args)
+        self.indexes.append(infos)
+
+    @property
+    def stats(self) -> Dict:
+        return {"imports": self.imports, "created": self.created, "ignored": self.ignored, "bytes": self.bytes,
+                "seconds": self.seconds}
+
+
+class NullDatabase(object):
+    def __init__(self, name: str, connection: "NullConnection"):
+        self.name = name
+        self.connection = connection
+        self.collections: Dict[str, NullCollection] = {}
+
+    def getURL(self) -> str:
+        return f"null://{self.name}"
+
+    def createCollection(self, className: str = "Collection", name: str = None, **kwargs) -> NullCollection:
+        if name in self.collections:
+            raise CreationError(f"Collection {name} already exists", None)
+        self.collections[name] = NullCollection(name, self, edges=className == "Edges")
+        return self.collections[name]
+
+    def __getitem__(self, name: str) -> NullCollection:
+        return self.collections[name]
+
+    def AQLQuery(self, query: str, **kwargs) -> List:
+        # no query engine: cache priming and retention passes simply see an empty database
+        return []
+
+
+class NullConnection(object):
+    def __init__(self):
+        self.databases: Dict[str, NullDatabase] = {}
+        self.session = NullSession(self)
+
+    def hasDatabase(self, name: str) -> bool:
+        return name in self.databases
+
+    def createDatabase(self, name: str, **kwargs) -> NullDatabase:
+        self.databases[name] = NullDatabase(name, self)
+        return self.databases[name]
@@ -0,0 +1,170 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from pyArango.database import Database
+from pyArango.theExceptions import DocumentNotFoundError
+from blockcache import BlockCache
+from retention import PRUNED
+import metrics
+
+
+# block_index statuses: linked to the block before it, prev_hash mismatch, given up on after the retry limit
+OK = "ok"
+UNLINKED = "unlinked"
+SKIPPED = "skipped"
+
+
+def index_document(block) -> dict:
+    # `block` is used rather than `height` so retention can prune the index with the same query and index as edges
+    return {"_key": str(block.height), "block": block.height, "hash": block.hash, "prev_hash": block.prev_hash,
+            "status": OK}
+
+
+def skipped_document(height: int) -> dict:
+    return {"_key": str(height), "block": height, "hash": None, "prev_hash": None, "status": SKIPPED}
+
+
+class BlockIndex(object):
+    # one document per ingested height with its hash and prev_hash, flushed with the block's documents
+    def __init__(self, database: Database):
+        self.database = database
+        self.tip: Optional[Tuple[int, str]] = None
+
+    def verify(self, document: dict):
+        # marks `document` UNLINKED if it doesn't continue the chain recorded so far; documents must come in height order
+        if document["status"] != OK:
+            self.tip = None
+            return
+        height = document["block"]
+        previous = self.tip[1] if self.tip is not None and self.tip[0] == height - 1 else self.stored_hash(height - 1)
+        if previous is not None and previous != document["prev_hash"]:
+            document["status"] = UNLINKED
+            metrics.CHAIN_BREAKS.inc()
+            metrics.log_event("chain_break", height=height, prev_hash=document["prev_hash"], stored_prev_hash=previous)
+            print(f"Block {height} doesn't link to the stored block {height - 1}: prev_hash {document['prev_hash']}, "
+                  f"stored hash {previous}")
+        self.tip = (height, document["hash"])
+
+    def stored_hash(self, height: int) -> Optional[str]:
+        try:
+            return self.database["block_index"].fetchDocument(str(height), rawResults=True).get("hash")
+        except DocumentNotFoundError:
+            return None
+
+    def scan(self, start: int, end: int, batch_size: int = 10000) -> Dict[str, List[int]]:
+        # heights in [start, end) that are missing, skipped, or don't link to the stored block before them
+        rows = self.database.AQLQuery("""FOR b IN block_index
+                                           FILTER b.block >= @start AND b.block < @end
+                                           SORT b.block
+                                           RETURN [b.block, b.hash, b.prev_hash, b.status]""",
+                                      bindVars={"start": start, "end": end}, rawResults=True, batchSize=batch_size)
+        problems = {"missing": [], SKIPPED: [], UNLINKED: []}
+        expected = start
+        previous: Optional[Tuple[int, str]] = None
+        for height, hash, prev_hash, status in rows:
+            problems["missing"].extend(range(expected, height))
+            expected = height + 1
+            if status == SKIPPED:
+                problems[SKIPPED].append(height)
+                previous = None
+                continue
+            if previous is not None and previous[0] == height - 1 and previous[1] != prev_hash:
+                problems[UNLINKED].append(height)
+            previous = (height, hash)
+        problems["missing"].extend(range(expected, end))
+        return problems
+
+    def last_stored(self, start: int, end: int) -> Optional[Tuple[int, str]]:
+        rows = self._all("""FOR b IN block_index
+                              FILTER b.block >= @start AND b.block < @end AND b.status != @skipped
+                              SORT b.block DESC
+                              LIMIT 1
+                              RETURN [b.block, b.hash]""", {"start": start, "end": end, "skipped": SKIPPED})
+        return tuple(rows[0]) if rows else None
+
+    def _all(self, aql: str, bind_vars: Dict) -> List:
+        return list(self.database.AQLQuery(aql, bindVars=bind_vars, rawResults=True, batchSize=10000))
+
+
+class ChainAudit(object):
+    # `etl.py --audit`; `source` names what hashes are checked against, `cache` is evicted for repaired heights
+    def __init__(self, follower, source: str, cache: Optional[BlockCache] = None):
+        self.follower = follower
+        self.index = follower.block_index
+        self.source = source
+        self.cache = cache
+
+    def run(self, start: int, end: int, repair: bool = False) -> Dict[str, List[int]]:
+        t = time.time()
+        problems = self.index.scan(start, end)
+        problems["diverged"], probes = self.diverged(start, end)
+        print(f"Audit of blocks {start}-{end - 1} against the {self.source} in {time.time() - t:.1f} seconds "
+              f"({probes} probes): "
+              + ", ".join(f"{len(heights)} {kind}" for kind, heights in problems.items()))
+        for kind, heights in problems.items():
+            if heights:
+                print(f"  {kind}: {compact_ranges(heights)}")
+        metrics.log_event("audit", start=start, end=end, source=self.source, probes=probes, seconds=time.time() - t,
+                          problems={kind: len(heights) for kind, heights in problems.items()})
+        if repair:
+            # both sides of a broken link are suspect
+            heights = set(problems["missing"] + problems[SKIPPED] + problems["diverged"])
+            heights.update(h for u in problems[UNLINKED] for h in (u - 1, u) if h >= start)
+            if heights:
+                self.repair(sorted(heights))
+        return problems
+
+    def diverged(self, start: int, end: int) -> Tuple[List[int], int]:
+        # stored heights from the first one whose hash differs from the node's; ([], probes) if the anchor matches
+        last = self.index.last_stored(start, end)
+        if last is None:
+            return [], 0
+        probes = 1
+        block = self.follower.client.block_get(last[0], None)
+        if block is None:
+            print(f"Node no longer serves block {last[0]}, skipping the anchor check")
+            return [], probes
+        if block.hash == last[1]:
+            return [], probes
+        good, bad = start - 1, last[0]
+        while bad - good > 1:
+            mid = (good + bad) // 2
+            stored = self.index.stored_hash(mid)
+            block = self.follower.client.block_get(mid, None)
+            probes += 1
+            if stored is None or block is None or block.hash == stored:
+                good = mid
+            else:
+                bad = mid
+        return list(range(bad, last[0] + 1)), probes
+
+    def repair(self, heights: List[int]):
+        # re-ingests through the normal write path and refreshes the witness links they touch
+        t = time.time()
+        batch_size = self.follower.settings.retention_batch_size
+        for i in range(0, len(heights), batch_size):
+            for collection in PRUNED:
+                self.follower.database.AQLQuery("""FOR d IN @@collection
+                                                     FILTER d.block IN @heights
+                                                     REMOVE d IN @@collection""",
+                                                bindVars={"@collection": collection, "heights": heights[i:i + batch_size]})
+        if self.cache is not None:
+            self.cache.discard_heights(heights)
+        self.index.tip = None
+        for height in heights:
+            self.follower.sync_block(height)
+            self.follower.writer.flush_if_due()
+        self.follower.writer.flush()
+        if self.follower.witness_links is not None:
+            self.follower.witness_links.refresh_blocks(heights[0], heights[-1] + 1)
+        print(f"Re-ingested {len(heights)} blocks in {time.time() - t:.1f} seconds")
+
+
+def compact_ranges(heights: List[int]) -> str:
+    # [1, 2, 3, 7] -> "1-3, 7"
+    ranges = []
+    for h in heights:
+        if ranges and ranges[-1][1] == h - 1:
+            ranges[-1][1] = h
+        else:
+            ranges.append([h, h])
+    return ", ".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+class BlockCache(object):
+    # raw node responses keyed by "block:<height>" or "txn:<hash>", least recently read evicted past max_bytes
+    def __init__(self, path: str, max_bytes: int, busy_timeout: float = 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # seconds to wait for another process's write to finish before giving up on a statement
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                key TEXT PRIMARY KEY,
+                                height INTEGER,
+                                value BLOB NOT NULL,
+                                size INTEGER NOT NULL,
+                                accessed REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_height ON entries (height)")
+        self.size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = value
+            if found:
+                now = time.time()
+                try:
+                    self._conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(now, k) for k in found])
+                except sqlite3.Error as e:
+                    print(f"Block cache access times not updated: {e}")
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: loads(zlib.decompress(value)) for key, value in found.items()}
+
+    def put_many(self, items: List[Tuple[str, Optional[int], Any]]):
+        # items are (key, block height or None, raw response)
+        rows = []
+        for key, height, raw in items:
+            value = zlib.compress(json.dumps(raw).encode("utf-8"))
+            rows.append((key, height, value, len(value), time.time()))
+        with self._lock:
+            try:
+                # a deferred BEGIN fails outright if another process writes between the SELECT and the INSERT
+                self._conn.execute("BEGIN IMMEDIATE")
+                added = 0
+                for row in rows:
+                    previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (row[0],)).fetchone()
+                    added += row[3] - (previous[0] if previous else 0)
+                    self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", row)
+                self._conn.execute("COMMIT")
+                self.size += added
+                if self.size > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                # only a cache: the responses are fetched from the node again next time
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                print(f"Block cache write failed, continuing without it: {e}")
+
+    def _evict(self):
+        # down to 10% below the cap, so eviction doesn't run on every write
+        target = self.max_bytes * 0.9
+        while self.size > target:
+            rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed LIMIT 1000").fetchall()
+            if not rows:
+                self.size = 0
+                return
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+            self.size -= sum(size for _, size in rows)
+
+    def discard_heights(self, heights: List[int]):
+        # blocks only; transactions are keyed by their hash
+        with self._lock:
+            for i in range(0, len(heights), 500):
+                chunk = heights[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, size FROM entries WHERE height IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+                self.size -= sum(size for _, size in rows)
+
+    def max_height(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("SELECT MAX(height) FROM entries").fetchone()[0]
+
+    @property
+    def stats(self) -> Dict:
+        return {"bytes": self.size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Dict, Optional
+import metrics
+
+
+class SeenCache(object):
+    # bounded LRU set of vertex keys known to exist, so their bare {"_key": ...} stubs aren't re-sent
+    def __init__(self, capacity: int, collection: str):
+        self.capacity = capacity
+        self.collection = collection
+        self._keys: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str) -> bool:
+        # returns True if the key was already known
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def prime(self, keys: Iterable[str]):
+        for key in keys:
+            if len(self._keys) >= self.capacity:
+                break
+            self._keys[key] = None
+        metrics.SEEN_CACHE_SIZE.set(len(self._keys), collection=self.collection)
+
+    def discard(self, key: str):
+        self._keys.pop(key, None)
+
+    def filter_new(self, documents: List[dict]) -> List[dict]:
+        # only bare key stubs are dropped, repeats within the same block included
+        hits, misses, evictions = self.hits, self.misses, self.evictions
+        new = [d for d in documents if len(d) > 1 or not self.add(d["_key"])]
+        # exported once per block rather than per key
+        metrics.SEEN_CACHE_LOOKUPS.inc(self.hits - hits, collection=self.collection, result="hit")
+        metrics.SEEN_CACHE_LOOKUPS.inc(self.misses - misses, collection=self.collection, result="miss")
+        metrics.SEEN_CACHE_EVICTIONS.inc(self.evictions - evictions, collection=self.collection)
+        metrics.SEEN_CACHE_SIZE.set(len(self._keys), collection=self.collection)
+        return new
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._keys),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class QueryCache(object):
+    # LRU of query results, dropped when sync_height advances; the TTL covers writers that don't move it
+    def __init__(self, capacity: int, ttl_s: float):
+        self.capacity = capacity
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.height: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str, height: int) -> Optional[List]:
+        with self._lock:
+            self._advance(height)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, height: int, rows: List):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._advance(height)
+            if height != self.height:
+                # computed before the follower moved on while it streamed; already stale
+                return
+            self._entries[key] = (time.time() + self.ttl_s, rows)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _advance(self, height: int):
+        if self.height is None or height > self.height:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self.height = height
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "height": self.height,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -1,18 +1,71 @@
+import json
 import requests
 from requests import Response
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
 from settings import Settings
-from typing import Optional, Dict, Union
-from random import randrange
+from typing import Optional, Dict, Union, List, Tuple, Any
 from models.block import Block
 from models.transactions.payment_v1 import PaymentV1
 from models.transactions.payment_v2 import PaymentV2
 from models.transactions.poc_receipts_v1 import PocReceiptsV1
 from models.transactions.poc_receipts_v2 import PocReceiptsV2
+from models.records import BlockRecord, parse_record
+from transformers import TRANSFORMERS, enabled_types
+from blockcache import BlockCache
+from metrics import RPC_SECONDS, PARSE_SECONDS
+
+try:
+    # optional, noticeably faster decoder for large poc_receipts responses
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+class RPCError(Exception):
+    pass
+
+
+class BlockNotAvailable(Exception):
+    # the node doesn't (yet) serve a block at this height
+    pass
+
+
+# failures worth retrying: the node being briefly unreachable, slow, or answering with an error / garbage
+TRANSIENT_RPC_ERRORS = (requests.ConnectionError, requests.Timeout, json.JSONDecodeError, RPCError)
+
+# process-wide, monotonically increasing JSON-RPC ids so responses in a batch can always be matched back
+_request_ids = count(1)
 
 
 class BlockchainNodeClient(object):
     def __init__(self, settings: Settings):
         self._node_address = settings.node_address
+        self._rpc_concurrency = settings.rpc_concurrency
+        self._rpc_batch_size = settings.rpc_batch_size
+        self._rpc_timeout = settings.rpc_timeout
+        self._strict = settings.parse_mode == "strict"
+        # transaction types fetched from the node; anything else in a block is skipped before transaction_get
+        self.transaction_types = set(enabled_types(settings.transaction_types))
+
+        # keep-alive pool shared by every prefetch worker's rpc_concurrency requests, plus height polls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.prefetch_workers * self._rpc_concurrency + 1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # created up front (its threads start on first use) so concurrent prefetch workers share one
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if self._rpc_concurrency > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self._rpc_concurrency, thread_name_prefix="rpc")
+
+        self._offline = settings.node_offline
+        self.cache: Optional[BlockCache] = None
+        if settings.block_cache_path:
+            self.cache = BlockCache(settings.block_cache_path, settings.block_cache_max_bytes)
+        if self._offline and self.cache is None:
+            raise Exception("NODE_OFFLINE requires BLOCK_CACHE_PATH to point at a populated block cache")
 
     @property
     def node_address(self):
@@ -20,50 +73,129 @@ class BlockchainNodeClient(object):
 
     @property
     def height(self):
-        return BaseRPCCall(self.node_address, "block_height", None, None).call()
+        if self._offline:
+            return self.cache.max_height()
+        return BaseRPCCall(self.node_address, "block_height", None, None, session=self.session, timeout=self._rpc_timeout).call()
 
     def block_get(self, height: Optional[int], hash: Optional[str]) -> Optional[Block]:
         if height:
-            params = {"height": height}
+            block_raw = self._get_raw("block_get", [{"height": height}])[0]
         elif hash:
-            params = {"hash": hash}
+            # only heights are cache keys; lookups by hash always go to the node
+            if self._offline:
+                return None
+            block_raw = BaseRPCCall(self.node_address, "block_get", {"hash": hash}, request_id=None, session=self.session, timeout=self._rpc_timeout).call()
         else:
             raise Exception("You must provide either a height (int) or hash (str) argument to block_get method")
-        block_raw = BaseRPCCall(self.node_address, "block_get", params, request_id=None).call()
         if not block_raw:
             return None
         else:
-            return Block.parse_obj(block_raw)
+            with PARSE_SECONDS.time(kind="block"):
+                return self.parse_block(block_raw)
+
+    def block_exists(self, height: int) -> bool:
+        # the node has no cheaper lookup than block_get, but skipping Block parsing keeps probes light
+        return self._get_raw("block_get", [{"height": height}])[0] is not None
 
+    def block_get_many(self, heights: List[int]) -> List[Optional[Block]]:
+        blocks_raw = self._get_raw("block_get", [{"height": height} for height in heights])
+        with PARSE_SECONDS.time(kind="blocks"):
+            return [self.parse_block(block_raw) if block_raw else None for block_raw in blocks_raw]
 
     def transaction_get(self, hash: str, type: str) -> Union[PaymentV1, PaymentV2, PocReceiptsV1, None]:
-        params = {"hash": hash}
-        response = BaseRPCCall(self.node_address, "transaction_get", params, request_id=None).call()
-        if type == "payment_v1":
-            return PaymentV1.parse_obj(response)
-        elif type == "payment_v2":
-            return PaymentV2.parse_obj(response)
-        elif type == "poc_receipts_v1":
-            return PocReceiptsV1.parse_obj(response)
-        elif type == "poc_receipts_v2":
-            return PocReceiptsV2.parse_obj(response)
-        else:
+        response = self._get_raw("transaction_get", [{"hash": hash}])[0]
+        with PARSE_SECONDS.time(kind="transaction"):
+            return self.parse_transaction(response, type)
+
+    def transaction_get_many(self, hashes_and_types: List[Tuple[str, str]]) -> List[Union[PaymentV1, PaymentV2, PocReceiptsV1, PocReceiptsV2, None]]:
+        # results come back in the same order as the input, so callers can't tell this apart from the serial path
+        responses = self._get_raw("transaction_get", [{"hash": hash} for hash, _ in hashes_and_types])
+        # transactions the node doesn't know about (-100) come back as None instead of failing the whole batch
+        with PARSE_SECONDS.time(kind="transactions"):
+            return [self.parse_transaction(response, type) if response is not None else None
+                    for response, (_, type) in zip(responses, hashes_and_types)]
+
+    def parse_block(self, block_raw: Dict) -> Union[Block, BlockRecord]:
+        return Block.parse_obj(block_raw) if self._strict else parse_record(BlockRecord, block_raw)
+
+    def parse_transaction(self, response: Optional[Dict], type: str):
+        if self._strict:
+            return parse_transaction(response, type)
+        if response is None:
+            # strict mode fails validation here; returning None lets the caller's missing-transaction retry kick in
+            return None
+        if type not in TRANSFORMERS:
             raise Exception(f"Unexpected transaction type: {type}")
+        return parse_record(TRANSFORMERS[type].record, response)
+
+    def _get_raw(self, method: str, params_list: List[Dict]) -> List[Any]:
+        # read-through / write-through the block cache when one is configured; offline, misses come back as None
+        if self.cache is None:
+            return self._call_many(method, params_list)
+        keys = [cache_key(method, params) for params in params_list]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing and not self._offline:
+            fetched = self._call_many(method, [params_list[i] for i in missing])
+            # not-found (-100) responses aren't cached: the block or transaction may just not exist yet
+            self.cache.put_many([(keys[i], params_list[i].get("height"), raw)
+                                 for i, raw in zip(missing, fetched) if raw is not None])
+            cached.update((keys[i], raw) for i, raw in zip(missing, fetched))
+        return [cached.get(key) for key in keys]
+
+    def _call_many(self, method: str, params_list: List[Dict]) -> List[Any]:
+        if self._rpc_batch_size <= 0 or len(params_list) == 1:
+            return self._map(
+                lambda params: BaseRPCCall(self.node_address, method, params, None, session=self.session, timeout=self._rpc_timeout).call(),
+                params_list
+            )
+        chunks = [params_list[i:i + self._rpc_batch_size] for i in range(0, len(params_list), self._rpc_batch_size)]
+        results = self._map(
+            lambda chunk: BatchRPCCall(
+                self.node_address,
+                [BaseRPCCall(self.node_address, method, params, None) for params in chunk],
+                session=self.session,
+                timeout=self._rpc_timeout
+            ).call(),
+            chunks
+        )
+        return [result for chunk_results in results for result in chunk_results]
+
+    def _map(self, fn, items: List) -> List:
+        if self._rpc_concurrency <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
 
 
+def cache_key(method: str, params: Dict) -> str:
+    if method == "block_get":
+        return f"block:{params['height']}"
+    return f"txn:{params['hash']}"
+
+
+def parse_transaction(response: Optional[Dict], type: str) -> BaseModel:
+    if type not in TRANSFORMERS:
+        raise Exception(f"Unexpected transaction type: {type}")
+    return TRANSFORMERS[type].model.parse_obj(response)
+
 
 class BaseRPCCall(object):
     def __init__(self, node_address: str,
                  method: str, params: Optional[Dict],
-                 request_id: Optional[str],
-                 jsonrpc: Optional[str] = "2.0"):
+                 request_id: Optional[int],
+                 jsonrpc: Optional[str] = "2.0",
+                 session: Optional[requests.Session] = None,
+                 timeout: Optional[float] = None):
         self.node_address = node_address
         self.method = method
         self.params = params
-        self.id = request_id if request_id else randrange(0, 99999)
+        self.id = request_id if request_id else next(_request_ids)
         self.jsonrpc = jsonrpc
+        self.session = session
+        self.timeout = timeout
 
-    def call(self):
+    @property
+    def payload(self) -> Dict:
         payload = {
             "method": self.method,
             "jsonrpc": self.jsonrpc,
@@ -71,7 +203,15 @@ class BaseRPCCall(object):
         }
         if self.params:
             payload["params"] = self.params
-        response = requests.post(self.node_address, json=payload).json()
+        return payload
+
+    def call(self):
+        post = self.session.post if self.session else requests.post
+        with RPC_SECONDS.time(method=self.method, batch="false"):
+            response = loads(post(self.node_address, json=self.payload, timeout=self.timeout).content)
+        return self.result(response)
+
+    def result(self, response: Dict):
         try:
             return response["result"]
         except KeyError:
@@ -79,8 +219,33 @@ class BaseRPCCall(object):
             if error["code"] == -100:
                 return None
             else:
-                raise Exception(f"Request {self.method} with params {self.params} failed with error: {error}")
-
+                raise RPCError(f"Request {self.method} with params {self.params} failed with error: {error}")
 
 
+class BatchRPCCall(object):
+    def __init__(self, node_address: str,
+                 calls: List[BaseRPCCall],
+                 session: Optional[requests.Session] = None,
+                 timeout: Optional[float] = None):
+        self.node_address = node_address
+        self.calls = calls
+        self.session = session
+        self.timeout = timeout
 
+    def call(self) -> List[Any]:
+        if not self.calls:
+            return []
+        post = self.session.post if self.session else requests.post
+        with RPC_SECONDS.time(method=self.calls[0].method, batch="true"):
+            response = loads(post(self.node_address, json=[c.payload for c in self.calls], timeout=self.timeout).content)
+        if isinstance(response, dict):
+            # the node rejected the batch as a whole (e.g. invalid request)
+            raise RPCError(f"Batch request of {len(self.calls)} calls failed with error: {response.get('error')}")
+        # JSON-RPC 2.0 allows batch responses in any order
+        responses = {r.get("id"): r for r in response}
+        results = []
+        for c in self.calls:
+            if c.id not in responses:
+                raise RPCError(f"No response for request {c.method} with params {c.params} (id {c.id}) in batch")
+            results.append(c.result(responses[c.id]))
+        return results
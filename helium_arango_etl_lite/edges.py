@@ -0,0 +1,89 @@
+from typing import Dict, Union
+
+try:
+    # optional, noticeably faster encoder; falls back to the standard library
+    from orjson import dumps as _dumps
+except ImportError:
+    import json
+
+    def _dumps(document: Dict) -> bytes:
+        return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+
+class Edge(object):
+    # __slots__ edge document that reads like a read-only dict; attributes never set are left out
+    __slots__ = ()
+
+    def __getitem__(self, name: str):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Edge):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class PaymentEdge(Edge):
+    __slots__ = ("_key", "_from", "_to", "hash", "amount", "block", "timestamp")
+
+    def __init__(self, key: str, payer: str, payee: str, hash: str, amount: int, block: int, timestamp: int):
+        self._key = key
+        self._from = "accounts/" + payer
+        self._to = "accounts/" + payee
+        self.hash = hash
+        self.amount = amount
+        self.block = block
+        self.timestamp = timestamp
+
+
+class ReceiptEdge(Edge):
+    __slots__ = ("_key", "_from", "_to", "frequency", "datarate", "is_valid", "signal", "snr", "timestamp", "hash",
+                 "block", "tx_power", "processing_time_s")
+
+    def __init__(self, key: str, challengee: str, witness, hash: str, block: int):
+        self._key = key
+        self._from = "hotspots/" + challengee
+        self._to = "hotspots/" + witness.gateway
+        self.frequency = witness.frequency
+        self.datarate = witness.datarate
+        self.is_valid = witness.is_valid
+        self.signal = witness.signal
+        self.snr = witness.snr
+        self.timestamp = witness.timestamp
+        self.hash = hash
+        self.block = block
+
+
+class RewardEdge(Edge):
+    __slots__ = ("_key", "_from", "_to", "amount", "reward_type", "start_epoch", "end_epoch", "hash", "block",
+                 "timestamp")
+
+    def __init__(self, key: str, gateway: str, account: str, amount: int, reward_type: str, start_epoch: int,
+                 end_epoch: int, hash: str, block: int, timestamp: int):
+        self._key = key
+        self._from = "hotspots/" + gateway
+        self._to = "accounts/" + account
+        self.amount = amount
+        self.reward_type = reward_type
+        self.start_epoch = start_epoch
+        self.end_epoch = end_epoch
+        self.hash = hash
+        self.block = block
+        self.timestamp = timestamp
+
+
+def encode(document: Union[Edge, Dict]) -> bytes:
+    # the one serialization a document goes through: one line of the JSONL payload posted to /_api/import
+    return _dumps(document.to_dict() if isinstance(document, Edge) else document)
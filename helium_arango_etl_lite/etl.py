@@ -1,6 +1,28 @@
+import argparse
 from follower import Follower
+import queries
+from settings import Settings
 
 if __name__ == "__main__":
-    follower = Follower()
-    follower.run()
+    parser = argparse.ArgumentParser(description="Helium blockchain -> ArangoDB ETL")
+    parser.add_argument("--backfill-worker", action="store_true",
+                        help="only work on backfill ranges planned by a running follower, then exit")
+    parser.add_argument("--audit", action="store_true",
+                        help="check the block index for gaps, skipped blocks and broken hash links, then exit")
+    parser.add_argument("--start", type=int, default=None,
+                        help="first height to audit (default: the retention window below sync_height)")
+    parser.add_argument("--end", type=int, default=None, help="height to stop auditing at, exclusive (default: sync_height)")
+    parser.add_argument("--repair", action="store_true", help="with --audit, re-ingest the affected blocks")
+    parser.add_argument("--serve-queries", action="store_true",
+                        help="serve the cached read-side queries (queries.py) over HTTP on QUERY_PORT")
+    args = parser.parse_args()
 
+    if args.serve_queries:
+        queries.serve(Settings())
+    elif args.audit:
+        Follower.audit(Settings(), args.start, args.end, args.repair)
+    elif args.backfill_worker:
+        Follower.backfill_worker(Settings())
+    else:
+        follower = Follower()
+        follower.run()
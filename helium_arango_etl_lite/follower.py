@@ -3,96 +3,293 @@ from models.transactions.poc_receipts_v1 import *
 from models.transactions.poc_receipts_v2 import *
 from models.transactions.payment_v2 import *
 from models.transactions.payment_v1 import *
-from client import BlockchainNodeClient
-from loaders import process_gateway_inventory
+from client import BlockchainNodeClient, BlockNotAvailable, TRANSIENT_RPC_ERRORS
+from backoff import Backoff
+from loaders import process_gateway_inventory, latest_gateway_inventory, InventoryFingerprints
+from pipeline import BackfillPipeline
+from writer import WriteBuffer
+from journal import BatchJournal
+from transformers import collections as transformer_collections
+from parquet_sink import ParquetSink
+from cache import SeenCache
+from retention import BufferedVertices, RetentionPruner
+from witness_links import WitnessLinks
+from indexes import reconcile_indexes
+from block_index import BlockIndex, ChainAudit, index_document, skipped_document
+from sharding import LeaseLost, RangeLease, RangeLeases, ShardedBackfill
+from parallel import ProcessPoolTransformer, worker_client
+import metrics
+from transform import fetch_block_transactions, build_block_documents, get_hash_of_dict
 from pyArango.connection import Connection
 from pyArango.database import Database
 from pyArango.collection import Collection, Edges
 from pyArango.document import Document
 from settings import Settings
 from pyArango.theExceptions import CreationError, DocumentNotFoundError, UpdateError
+import signal
+import threading
 import time
-import hashlib
-import json
-from typing import Union
+from typing import Union, Tuple, Dict
 from pydantic.error_wrappers import ValidationError
+from models.records import RecordError
+
+
+class ShutdownRequested(Exception):
+    # raised out of a block that was interrupted by SIGTERM / SIGINT before any of its documents were buffered
+    pass
 
 
 class Follower(object):
-    def __init__(self):
-        self.settings = Settings()
+    def __init__(self, settings: Optional[Settings] = None, client: Optional[BlockchainNodeClient] = None,
+                 connection: Optional[Connection] = None):
+        # settings, node client and Arango connection can be injected, e.g. by the benchmarks' stand-ins
+        self.settings = settings or Settings()
+        metrics.configure(self.settings)
 
-        self.client = BlockchainNodeClient(self.settings)
+        self.client = client or BlockchainNodeClient(self.settings)
 
-        self.connection = Connection(
+        self.connection = connection or Connection(
             self.settings.arango_address,
             self.settings.arango_username,
-            self.settings.arango_password
+            self.settings.arango_password,
+            # keep-alive pool shared by the writer, retention and query threads
+            pool_maxsize=self.settings.arango_pool_size,
+            timeout=self.settings.arango_timeout
         )
         self.database: Optional[Database] = None
         self.poc_receipts: Optional[Edges] = None
         self.payments: Optional[Edges] = None
+        self.rewards: Optional[Edges] = None
         self.hotspots: Optional[Collection] = None
         self.accounts: Optional[Collection] = None
         self.follower_info: Optional[Collection] = None
+        self.writer: Optional[WriteBuffer] = None
+        self.seen_caches: Dict[str, SeenCache] = {}
+        self.pruner: Optional[RetentionPruner] = None
+        self.witness_links: Optional[WitnessLinks] = None
+        self.block_index: Optional[BlockIndex] = None
+        # set in sharded backfill workers, which only sync leased ranges and checkpoint into them
+        self.backfill_only = False
+        self.lease: Optional[RangeLease] = None
+        self.leases: Optional[RangeLeases] = None
+        self.journal: Optional[BatchJournal] = None
+        self.buffered_vertices = BufferedVertices()
+        # set by SIGTERM / SIGINT: finish the block being written, flush, checkpoint and stop
+        self.stopping = threading.Event()
 
         self.height = self.client.height
         self.first_block: Optional[int] = None
         self.sync_height: Optional[int] = None
+        self.first_block_search: Dict = {}
         self.inventory_height: Optional[int] = None
+        self.inventory_checked_at = 0.0
+        self.inventory_stats: Dict = {}
+        self.inventory_fingerprints = InventoryFingerprints(self.settings.gateway_inventory_path)
+        self.inventory_fingerprints.load()
+
+        self.process_pool: Optional[ProcessPoolTransformer] = None
+        if self.settings.transform_processes > 0:
+            self.process_pool = ProcessPoolTransformer(
+                self.settings, self.settings.transform_processes, self.process_block_parallel
+            )
 
     def run(self):
+        self.handle_signals()
         self.init_database()
         self.get_first_block()
+        self.replay_journal()
         self.update_follower_info()
 
         if self.settings.gateway_inventory_bootstrap:
             self.update_gateway_inventory()
             print("Gateway inventory imported successfully")
 
+        # ranges left unfinished by an interrupted backfill are resumed however close to the tip sync_height is
+        if self.settings.backfill_workers > 0 and (self.height - self.sync_height > self.settings.backfill_range_size
+                                                   or RangeLeases(self.database, self.settings.backfill_lease_seconds).pending()):
+            start = self.sync_height
+            backfill = ShardedBackfill(self, self.settings.backfill_workers, self.backfill_worker)
+            end = backfill.run(start, self.height + 1)
+            if self.stopping.is_set():
+                # the ranges keep their checkpoints; the next start picks them up again
+                self.close()
+                return
+            self.sync_height = end
+            if self.witness_links is not None:
+                print(f"Refreshed {self.witness_links.refresh_blocks(start, self.sync_height)} witness links")
+            self.update_follower_info()
+
+        if self.settings.retention_interval > 0:
+            self.pruner.start()
+
         print(f"Blockchain follower starting from block {self.sync_height} / {self.height}")
 
-        while True:
-            t = time.time()
+        poll = Backoff(self.settings.follow_poll_min, self.settings.follow_poll_max)
+        try:
+            while not self.stopping.is_set():
+                if self.sync_height > self.height:
+                    # caught up with what we last knew of the node: ask again, cheaply, until a new block appears
+                    try:
+                        self.height = self.client.height
+                        metrics.set_heights(self.sync_height, self.height)
+                    except TRANSIENT_RPC_ERRORS as e:
+                        print(f"couldn't get node height: {e}")
+                    if self.sync_height > self.height:
+                        # don't leave documents sitting in the buffer while we wait for new blocks
+                        self.writer.flush()
+                        self.stopping.wait(poll.next())
+                        continue
+                    poll.reset()
+
+                if self.settings.pipeline_depth > 0 and self.height - self.sync_height > self.settings.pipeline_depth:
+                    pipeline = BackfillPipeline(self, self.settings.pipeline_depth, self.settings.prefetch_workers)
+                    self.sync_height = pipeline.run(self.sync_height, self.height)
+                    continue
 
-            retry = 0
-            while retry < 50:
+                t = time.time()
                 try:
-                    if self.sync_height - self.inventory_height > 500:
-                        self.update_gateway_inventory()
-                    self.process_block(self.sync_height)
-                    # self.delete_old_receipts() # deletions not optimized yet
+                    self.sync_block(self.sync_height)
+                except ShutdownRequested:
                     break
-                except (ValidationError, AttributeError):
-                    print("couldn't find transaction...retrying")
-                    time.sleep(10)
-                    retry += 1
-            self.sync_height += 1
+                self.sync_height += 1
 
-            print(f"Block {self.sync_height - 1} synced in {time.time() - t} seconds...")
-            self.update_follower_info()
-            if self.sync_height >= self.height:
-                time.sleep(10)
+                metrics.BLOCK_SECONDS.observe(time.time() - t)
+                metrics.set_heights(self.sync_height, self.height)
+                print(f"Block {self.sync_height - 1} synced in {time.time() - t} seconds...")
+                self.writer.flush_if_due()
+        finally:
+            # everything in the buffer belongs to fully processed blocks, so it is safe to write on the way out
+            self.close()
+        print(f"Stopped cleanly before block {self.sync_height}")
+
+    def close(self):
+        # flushes and closes the write buffer (and its sinks and journal), then stops the transform processes
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            if self.process_pool is not None:
+                self.process_pool.close()
+                self.process_pool = None
+
+    def handle_signals(self):
+        # the first SIGTERM / SIGINT drains and checkpoints; only a repeat of the same signal aborts
+        received = set()
+
+        def stop(signum, frame):
+            if signum in received:
+                raise KeyboardInterrupt
+            received.add(signum)
+            print(f"Received {signal.Signals(signum).name}, finishing in-flight blocks (signal again to abort)")
+            self.stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    def journal_state(self) -> Dict:
+        # what a journaled batch checkpoints to; range batches checkpoint into their lease
+        if self.lease is not None:
+            return {"range": self.lease.key, "checkpoint": self.sync_height}
+        return {"sync_height": self.sync_height}
+
+    def replay_journal(self):
+        # range batches are only re-imported; sync_height never moves past the lowest unfinished range
+        if self.journal is None:
+            return
+        unfinished = RangeLeases(self.database, self.settings.backfill_lease_seconds).lowest_unfinished()
+        for batch in self.journal.pending():
+            documents = sum(len(d) for d in batch["documents"].values())
+            state = batch["state"]
+            if "sync_height" in state:
+                sync_height = state["sync_height"] if unfinished is None else min(state["sync_height"], unfinished)
+                print(f"Replaying journaled batch up to block {state['sync_height'] - 1}: {documents} documents")
+                self.sync_height = max(self.sync_height or 0, sync_height)
+            else:
+                print(f"Replaying journaled batch of backfill range {state['range']} up to block "
+                      f"{state['checkpoint'] - 1}: {documents} documents")
+            self.writer.add(batch["documents"])
+        self.writer.flush()
+
+    def sync_block(self, height: int) -> bool:
+        # unavailable blocks and transient errors are waited out; False after 50 missing / invalid transaction attempts
+        backoff = Backoff(self.settings.retry_backoff_min, self.settings.retry_backoff_max)
+        retry = 0
+        while True:
+            if self.stopping.is_set():
+                raise ShutdownRequested(height)
+            try:
+                self.maybe_update_gateway_inventory()
+                self.process_block(height)
+                return True
+            except BlockNotAvailable:
+                self.stopping.wait(backoff.next())
+            except TRANSIENT_RPC_ERRORS as e:
+                print(f"transient error syncing block {height}: {e}...retrying")
+                self.stopping.wait(backoff.next())
+            except (ValidationError, RecordError, AttributeError):
+                retry += 1
+                if retry >= 50:
+                    print(f"Block {height} could not be synced after {retry} attempts, skipping...")
+                    metrics.log_event("block_skipped", height=height, attempts=retry)
+                    self.record_skipped(height)
+                    return False
+                print("couldn't find transaction...retrying")
+                self.stopping.wait(backoff.next())
 
     def init_database(self):
         if self.connection.hasDatabase(self.settings.arango_database) is False:
             self.connection.createDatabase(self.settings.arango_database)
         self.database: Database = self.connection.databases[self.settings.arango_database]
-        for e in ["poc_receipts", "payments"]:
+        for e in ["poc_receipts", "payments", "rewards", "witness_links"]:
             try:
                 self.database.createCollection(className="Edges", name=e)
             except CreationError:
                 pass
-        for c in ["hotspots", "accounts", "follower_info"]:
+        for c in ["hotspots", "accounts", "follower_info", "block_index"]:
             try:
                 self.database.createCollection(className="Collection", name=c)
             except CreationError:
                 pass
         self.poc_receipts = self.database["poc_receipts"]
         self.payments = self.database["payments"]
+        self.rewards = self.database["rewards"]
         self.hotspots = self.database["hotspots"]
         self.accounts = self.database["accounts"]
         self.follower_info = self.database["follower_info"]
+        self.block_index = BlockIndex(self.database)
+        for collection, actions in reconcile_indexes(self.database).items():
+            print(f"Indexes on {collection}: {', '.join(actions)}")
+        sinks = [sink for sink in [ParquetSink.from_settings(self.settings)] if sink is not None]
+        # concurrent backfill workers would race on the same pairs; the coordinator refreshes them afterwards
+        if self.settings.witness_links and not self.backfill_only:
+            self.witness_links = WitnessLinks(self.database, self.settings.retention_batch_size)
+            sinks.append(self.witness_links)
+        # backfill workers checkpoint into their leases and simply redo an interrupted range instead
+        if self.settings.journal_path and not self.backfill_only:
+            self.journal = BatchJournal(self.settings.journal_path, self.journal_state)
+        self.writer = WriteBuffer(
+            {c: self.database[c] for c in transformer_collections() + ["block_index"]},
+            self.checkpoint,
+            self.settings.write_buffer_documents,
+            self.settings.write_buffer_bytes,
+            self.settings.write_buffer_seconds,
+            sinks=sinks,
+            # hotspot documents carry data (owner, location, ...) that later transactions refresh
+            on_duplicate={"hotspots": "update"},
+            journal=self.journal
+        )
+        self.pruner = RetentionPruner(self.database, self.settings, lambda: self.sync_height, self.seen_caches,
+                                      self.witness_links, self.buffered_vertices)
+        # accounts only: SeenCache drops bare {_key} stubs, and hotspot documents always carry data
+        if self.settings.seen_cache_size > 0:
+            self.seen_caches["accounts"] = SeenCache(self.settings.seen_cache_size, "accounts")
+            self.prime_seen_cache("accounts")
+
+    def prime_seen_cache(self, collection: str):
+        aql = f"FOR v IN {collection} LIMIT @n RETURN v._key"
+        keys = self.database.AQLQuery(aql, bindVars={"n": self.settings.seen_cache_size}, rawResults=True, batchSize=10000)
+        self.seen_caches[collection].prime(keys)
+        print(f"Seen cache for {collection} primed with {len(self.seen_caches[collection])} keys")
 
     def get_first_block(self):
         print("Getting first block...")
@@ -100,18 +297,45 @@ class Follower(object):
             follower_info = self.follower_info.fetchDocument("follower_info")
             self.first_block = follower_info["first_block"]
             self.sync_height = follower_info["sync_height"]
+            self.inventory_height = follower_info["inventory_height"]
             print(f"first_block height found from database: {self.first_block}")
         except DocumentNotFoundError:
-            h = self.height
-            while True:
-                if h < (self.height - self.settings.block_inventory_size) or self.client.block_get(h, None) is None:
-                    self.first_block = h + 1
-                    print(f"first_block height found!: {self.first_block}")
-                    break
-                else:
-                    h -= 1
-                    if h % 100 == 0:
-                        print(f"...still finding blocks, at {h} / {self.height}")
+            t = time.time()
+            self.first_block, probes = self.find_first_block()
+            self.first_block_search = {"tip": self.height, "probes": probes, "seconds": time.time() - t}
+            print(f"first_block height found!: {self.first_block} ({probes} probes in {time.time() - t:.1f} seconds)")
+
+    def find_first_block(self) -> Tuple[int, int]:
+        # gallops back from the tip and bisects; returns (first_block, number of probes)
+        tip = self.height
+        floor = max(tip - self.settings.block_inventory_size, 1)
+        probes = 0
+
+        def exists(h: int) -> bool:
+            nonlocal probes
+            probes += 1
+            return self.client.block_exists(h)
+
+        if not exists(tip):
+            return tip + 1, probes
+        if exists(floor):
+            return floor, probes
+
+        present, missing, step = tip, floor, 1
+        while tip - step > floor:
+            if exists(tip - step):
+                present = tip - step
+                step *= 2
+            else:
+                missing = tip - step
+                break
+        while present - missing > 1:
+            mid = (present + missing) // 2
+            if exists(mid):
+                present = mid
+            else:
+                missing = mid
+        return present, probes
 
     def update_follower_info(self):
         if not self.first_block:
@@ -122,174 +346,192 @@ class Follower(object):
             "_key": "follower_info",
             "height": self.height,
             "first_block": self.first_block,
+            "first_block_search": self.first_block_search,
             "sync_height": self.sync_height,
-            "inventory_height": self.inventory_height
+            "inventory_height": self.inventory_height,
+            "seen_caches": {c: cache.stats for c, cache in self.seen_caches.items()},
+            "inventory_sync": self.inventory_stats,
+            "retention": self.pruner.last_stats
         }
         self.follower_info.createDocument(follower_info).save(overwriteMode="replace")
 
+    def checkpoint(self):
+        # called by WriteBuffer.flush once everything buffered so far has been imported
+        self.buffered_vertices.clear()
+        if self.lease is not None:
+            self.leases.checkpoint(self.lease, self.sync_height)
+        elif not self.backfill_only:
+            self.update_follower_info()
+
+    def work_ranges(self, leases: RangeLeases):
+        # syncs leased backfill ranges until none are left to lease
+        self.leases = leases
+        while not self.stopping.is_set():
+            lease = leases.acquire()
+            if lease is None:
+                return
+            print(f"Backfilling blocks {lease.checkpoint}-{lease.end - 1} ({leases.owner})")
+            self.lease = lease
+            try:
+                self.sync_range(lease.checkpoint, lease.end)
+                # the buffer may have been empty at the last flush, so record the end explicitly
+                leases.checkpoint(lease, lease.end)
+            except LeaseLost as e:
+                print(f"{e}, moving on")
+            except ShutdownRequested:
+                # checkpoints what was synced into the lease; the rest of the range is picked up once it expires
+                self.writer.flush()
+                return
+            finally:
+                self.lease = None
+
+    def sync_range(self, start: int, end: int):
+        if self.settings.pipeline_depth > 0:
+            if BackfillPipeline(self, self.settings.pipeline_depth, self.settings.prefetch_workers).run(start, end) < end:
+                raise ShutdownRequested(start)
+            return
+        self.sync_height = start
+        while self.sync_height < end:
+            self.sync_block(self.sync_height)
+            self.sync_height += 1
+            self.writer.flush_if_due()
+        self.writer.flush()
+
+    @staticmethod
+    def backfill_worker(settings: Settings):
+        # entry point of a sharded backfill worker process (or `etl.py --backfill-worker` on another host)
+        follower = Follower(settings=settings)
+        follower.handle_signals()
+        follower.backfill_only = True
+        try:
+            follower.init_database()
+            leases = RangeLeases(follower.database, settings.backfill_lease_seconds)
+            while not follower.stopping.is_set():
+                follower.work_ranges(leases)
+                if not leases.pending():
+                    break
+                # the rest is leased to other workers; stay around in case one of them dies
+                follower.stopping.wait(min(settings.backfill_lease_seconds / 4, 30))
+        finally:
+            follower.close()
+
+    @staticmethod
+    def audit(settings: Settings, start: Optional[int], end: Optional[int], repair: bool):
+        # `etl.py --audit`; never moves follower_info, so it can run next to the follower
+        follower = Follower(settings=settings)
+        follower.backfill_only = True
+        try:
+            follower.init_database()
+            follower.get_first_block()
+            if end is None:
+                end = follower.sync_height or follower.first_block
+            if start is None:
+                start = max(follower.first_block, end - settings.block_inventory_size)
+            if settings.witness_links:
+                # not a sink here: repair refreshes the links of the blocks it re-ingests in one go
+                follower.witness_links = WitnessLinks(follower.database, settings.retention_batch_size)
+            cache = follower.client.cache
+            if settings.node_offline:
+                # nothing else to check against; this only finds gaps and breaks in the stored chain, never a fork
+                source = "block cache (NODE_OFFLINE)"
+                cache = None
+            else:
+                # the cache holds the very responses that were ingested, so probes and repairs go to the node itself
+                follower.client.cache = None
+                source = f"node {settings.node_address}"
+            ChainAudit(follower, source, cache).run(start, end, repair)
+        finally:
+            follower.close()
+
+    def maybe_update_gateway_inventory(self):
+        # at most every INVENTORY_CHECK_INTERVAL seconds; backfill workers leave it to the coordinator
+        if self.backfill_only:
+            return
+        if self.sync_height - (self.inventory_height or 0) > 500 \
+                and time.time() - self.inventory_checked_at >= self.settings.inventory_check_interval:
+            self.update_gateway_inventory()
+
     def update_gateway_inventory(self):
-        gateway_inventory, inventory_height = process_gateway_inventory(self.settings)
-        self.hotspots.importBulk(gateway_inventory)
+        t = time.time()
+        self.inventory_checked_at = t
+        inventory_url, inventory_height = latest_gateway_inventory(self.settings)
+        if self.hotspots.count() == 0:
+            # fingerprints describe what is in the database; start over if it has been wiped
+            self.inventory_fingerprints.reset()
+        elif inventory_height == self.inventory_height:
+            self.inventory_stats = {"inventory_height": inventory_height, "downloaded": False}
+            metrics.record_inventory_sync(self.inventory_stats)
+            return
+        stats = {}
+        for batch in process_gateway_inventory(inventory_url, self.inventory_fingerprints,
+                                               self.settings.inventory_chunk_size, stats):
+            # complete: a batch is imported in full or raises before its fingerprints are recorded
+            self.hotspots.importBulk(batch, onDuplicate="replace", complete="true")
         self.inventory_height = inventory_height
+        self.inventory_fingerprints.inventory_height = inventory_height
+        self.inventory_fingerprints.save()
+        self.inventory_stats = {"inventory_height": inventory_height, "downloaded": True, "seconds": time.time() - t, **stats}
+        metrics.record_inventory_sync(self.inventory_stats)
 
     def process_block(self, height: int):
-        block = self.client.block_get(height, None)
-        payment_documents = []
-        receipt_documents = []
-        account_documents = []
-        # hotspot_documents = []
-        _t = time.time()
-
-        for txn in block.transactions:
-
-            if txn.type == "payment_v1":
-                transaction: PaymentV1 = self.client.transaction_get(txn.hash, txn.type)
-                account_documents.append({"_key": transaction.payer})
-                payment_document = {
-                    "_from": "accounts/" + transaction.payer,
-                    "_to": "accounts/" + transaction.payee,
-                    "hash": transaction.hash,
-                    "amount": transaction.amount,
-                    "block": block.height,
-                    "timestamp": block.time
-                }
-                account_documents.append({"_key": transaction.payee})
-                payment_key = get_hash_of_dict(payment_document)
-                payment_document["_key"] = payment_key
-                payment_documents.append(payment_document)
-            elif txn.type == "payment_v2":
-                transaction: PaymentV2 = self.client.transaction_get(txn.hash, txn.type)
-                account_documents.append({"_key": transaction.payer})
-                for payment in transaction.payments:
-                    payment_document = {
-                        "_from": "accounts/" + transaction.payer,
-                        "_to": "accounts/" + payment.payee,
-                        "hash": transaction.hash,
-                        "amount": payment.amount,
-                        "block": block.height,
-                        "timestamp": block.time
-                    }
-
-                    account_documents.append({"_key": payment.payee})
-                    payment_key = get_hash_of_dict(payment_document)
-                    payment_document["_key"] = payment_key
-                    payment_documents.append(payment_document)
-            elif txn.type in ["poc_receipts_v1", "poc_receipts_v2"]:
-                transaction: Union[PocReceiptsV1, PocReceiptsV2] = self.client.transaction_get(txn.hash, txn.type)
-                # hotspot_documents.append({"_key": transaction.path[0].challengee})
-                for witness in transaction.path[0].witnesses:
-                    receipt_document = {
-                        "_from": "hotspots/" + transaction.path[0].challengee,
-                        "_to": "hotspots/" + witness.gateway,
-                        # "tx_power": transaction.path[0].receipt.tx_power,
-                        "frequency": witness.frequency,
-                        "datarate": witness.datarate,
-                        "is_valid": witness.is_valid,
-                        "signal": witness.signal,
-                        "snr": witness.snr,
-                        "timestamp": witness.timestamp,
-                        "hash": txn.hash,
-                        "block": block.height
-                    }
-                    try:
-                        receipt_document["tx_power"] = transaction.path[0].receipt.tx_power
-                        receipt_document["processing_time_s"] = (witness.timestamp - transaction.path[0].receipt.timestamp) / 1e9
-                    except AttributeError:  # some receipts don't have "receipt" field
-                        pass
-                    # hotspot_documents.append({"_key": witness.gateway})
-                    receipt_key = get_hash_of_dict(receipt_document)
-                    receipt_document["_key"] = receipt_key
-                    receipt_documents.append(receipt_document)
-                    # elif txn.type == "add_gateway_v1":
-
-        self.payments.importBulk(payment_documents, onDuplicate="ignore")
-        self.accounts.importBulk(account_documents, onDuplicate="ignore")
-        self.poc_receipts.importBulk(receipt_documents, onDuplicate="ignore")
-        # self.hotspots.importBulk(hotspot_documents, onDuplicate="ignore")
+        t = time.time()
+        if self.process_pool is not None:
+            # shard the block's transactions across the worker processes
+            block = self.client.block_get(height, None)
+            if block is None:
+                # as in fetch_block_transactions: waited out by sync_block, not counted towards skipping the block
+                raise BlockNotAvailable(height)
+            t_fetch = time.time()
+            documents = self.process_pool.transform_block(block)
+            documents["block_index"] = [index_document(block)]
+        else:
+            block, txns, transactions = self.fetch_block(height)
+            t_fetch = time.time()
+            documents = self.transform_block(block, txns, transactions)
+        t_transform = time.time()
+        self.write_documents(documents)
+        metrics.log_event("block", height=height, fetch=t_fetch - t, transform=t_transform - t_fetch,
+                          write=time.time() - t_transform, documents={c: len(d) for c, d in documents.items()})
+
+    def fetch_block(self, height: int) -> Tuple[Block, List[BlockTransaction], List]:
+        with metrics.FETCH_SECONDS.time():
+            return fetch_block_transactions(self.client, height)
+
+    def transform_block(self, block: Block, txns: List[BlockTransaction], transactions: List) -> Dict[str, List[dict]]:
+        with metrics.TRANSFORM_SECONDS.time():
+            documents = build_block_documents(block.height, block.time, txns, transactions)
+        documents["block_index"] = [index_document(block)]
+        return documents
+
+    def write_documents(self, documents: Dict[str, List[dict]]):
+        # blocks arrive here in height order on every path, so this is where chain linkage is checked
+        for document in documents.get("block_index", []):
+            self.block_index.verify(document)
+        # atomic for the orphan sweep: a vertex whose stub is dropped here is already marked buffered
+        with self.buffered_vertices.lock:
+            for collection, cache in self.seen_caches.items():
+                if collection in documents:
+                    documents[collection] = cache.filter_new(documents[collection])
+            if self.settings.retention_gc_vertices:
+                self.buffered_vertices.add(documents)
+        # buffered; imported together with the follower_info checkpoint by WriteBuffer.flush
+        self.writer.add(documents)
+
+    def record_skipped(self, height: int):
+        # keeps the gap visible to `etl.py --audit` instead of silently moving past it
+        metrics.BLOCKS_SKIPPED.inc()
+        self.write_documents({"block_index": [skipped_document(height)]})
 
     def delete_old_receipts(self):
-        aql = f"""for receipt in poc_receipts
-                    filter receipt.block < {self.sync_height - self.settings.block_inventory_size}
-                    remove receipt in poc_receipts"""
-        self.database.AQLQuery(aql)
+        # one synchronous retention pass; normally RetentionPruner runs these on its own thread
+        return self.pruner.prune()
 
     @staticmethod
     def process_block_parallel(transactions: List[BlockTransaction], block_height: int, block_time: int, settings: Settings, output_dict: dict,
                                i: int):
-        payment_documents = []
-        receipt_documents = []
-        account_documents = []
-        hotspot_documents = []
-        _t = time.time()
-
-        client = BlockchainNodeClient(settings)
-        for txn in transactions:
-            if txn.type == "payment_v1":
-                transaction: PaymentV1 = client.transaction_get(txn.hash, txn.type)
-                account_documents.append({"_key": transaction.payer})
-                payment_document = {
-                    "_from": "accounts/" + transaction.payer,
-                    "_to": "accounts/" + transaction.payee,
-                    "hash": transaction.hash,
-                    "amount": transaction.amount,
-                    "block": block_height,
-                    "timestamp": block_time
-                }
-                account_documents.append({"_key": transaction.payee})
-                payment_key = get_hash_of_dict(payment_document)
-                payment_document["_key"] = payment_key
-                payment_documents.append(payment_document)
-            elif txn.type == "payment_v2":
-                transaction: PaymentV2 = client.transaction_get(txn.hash, txn.type)
-                account_documents.append({"_key": transaction.payer})
-                for payment in transaction.payments:
-                    payment_document = {
-                        "_from": "accounts/" + transaction.payer,
-                        "_to": "accounts/" + payment.payee,
-                        "hash": transaction.hash,
-                        "amount": payment.amount,
-                        "block": block_height,
-                        "timestamp": block_time
-                    }
-
-                    account_documents.append({"_key": payment.payee})
-                    payment_key = get_hash_of_dict(payment_document)
-                    payment_document["_key"] = payment_key
-                    payment_documents.append(payment_document)
-            elif txn.type in ["poc_receipts_v1", "poc_receipts_v2"]:
-                transaction: Union[PocReceiptsV1, PocReceiptsV2] = client.transaction_get(txn.hash, txn.type)
-                hotspot_documents.append({"_key": transaction.path[0].challengee})
-                for witness in transaction.path[0].witnesses:
-                    receipt_document = {
-                        "_from": "hotspots/" + transaction.path[0].challengee,
-                        "_to": "hotspots/" + witness.gateway,
-                        # "tx_power": transaction.path[0].receipt.tx_power,
-                        "frequency": witness.frequency,
-                        "datarate": witness.datarate,
-                        "is_valid": witness.is_valid,
-                        "signal": witness.signal,
-                        "snr": witness.snr,
-                        "timestamp": witness.timestamp,
-                        "hash": txn.hash,
-                        "block": block_height
-                    }
-                    hotspot_documents.append({"_key": witness.gateway})
-                    receipt_key = get_hash_of_dict(receipt_document)
-                    receipt_document["_key"] = receipt_key
-                    receipt_documents.append(receipt_document)
-
-        output = {
-            "payment_documents": payment_documents,
-            "receipt_documents": receipt_documents,
-            "account_documents": account_documents,
-            "hotspot_documents": hotspot_documents
-        }
-
-        output_dict[i] = output
+        # runs inside a ProcessPoolTransformer worker on one shard of a block's transactions
+        client = worker_client(settings)
+        txns = [txn for txn in transactions if txn.type in client.transaction_types]
+        fetched = client.transaction_get_many([(txn.hash, txn.type) for txn in txns])
+        output_dict[i] = build_block_documents(block_height, block_time, txns, fetched)
         return output_dict
-        # return payment_documents, receipt_documents, account_documents, hotspot_documents
-
-
-def get_hash_of_dict(d: dict) -> str:
-    return hashlib.md5(json.dumps(d, sort_keys=True).encode('utf-8')).hexdigest()
-
@@ -0,0 +1,68 @@
+from typing import Dict, List
+from pyArango.collection import Collection
+from pyArango.database import Database
+from pyArango.index import Index
+from pyArango.theExceptions import pyArangoException
+
+
+def persistent(*fields: str, unique: bool = False, sparse: bool = False) -> Dict:
+    return {"type": "persistent", "fields": list(fields), "unique": unique, "sparse": sparse,
+            "name": "idx_" + "_".join(field.lstrip("_") for field in fields)}
+
+
+# every index the follower relies on, matched by name or identical definition; others are never touched
+INDEXES: Dict[str, List[Dict]] = {
+    # retention and analytics by block, hash and time; queries.GraphQueries by vertex and block
+    "poc_receipts": [persistent("block"), persistent("hash"), persistent("timestamp"), persistent("_from", "block")],
+    "payments": [persistent("block"), persistent("hash"), persistent("timestamp"), persistent("_from", "block"),
+                 persistent("_to", "block")],
+    "rewards": [persistent("block"), persistent("hash"), persistent("timestamp")],
+    # audits scan height ranges; retention prunes it with the edges
+    "block_index": [persistent("block")],
+    # retention refreshes links whose oldest receipt falls below the cutoff
+    "witness_links": [persistent("first_block")],
+    # GeoJSON points from the gateway inventory and assert_location transactions
+    "hotspots": [{"type": "geo", "fields": ["location_geo"], "geoJson": True, "name": "idx_location_geo"}]
+}
+
+# attributes that make two index definitions equivalent
+_DEFINITION = ["type", "fields", "unique", "sparse", "geoJson"]
+
+
+def _same_definition(wanted: Dict, existing: Dict) -> bool:
+    return all(existing.get(k) == wanted[k] for k in _DEFINITION if k in wanted)
+
+
+def existing_indexes(collection: Collection) -> List[Dict]:
+    # raw /_api/index descriptions; pyArango 2.1.1's getIndexes raises KeyError on edge indexes
+    r = collection.connection.session.get(f"{collection.database.getURL()}/index",
+                                          params={"collection": collection.name})
+    data = r.json()
+    if r.status_code != 200 or data.get("error"):
+        raise pyArangoException(data.get("errorMessage", f"listing indexes of {collection.name} failed"), data)
+    return data["indexes"]
+
+
+def reconcile_indexes(database: Database, declared: Dict[str, List[Dict]] = None) -> Dict[str, List[str]]:
+    # creates missing indexes and replaces changed ones; returns {collection: [actions]}
+    declared = INDEXES if declared is None else declared
+    actions = {}
+    for name, wanted_indexes in declared.items():
+        try:
+            collection = database[name]
+        except KeyError:
+            continue
+        existing = existing_indexes(collection)
+        for wanted in wanted_indexes:
+            by_name = [infos for infos in existing if infos.get("name") == wanted["name"]]
+            if any(_same_definition(wanted, infos) for infos in by_name):
+                continue
+            if not by_name and any(_same_definition(wanted, infos) for infos in existing):
+                continue
+            for infos in by_name:
+                Index(collection, infos=infos).delete()
+                actions.setdefault(name, []).append(f"dropped {wanted['name']} (definition changed)")
+            args = {k: v for k, v in wanted.items() if k not in ["type", "fields", "name"]}
+            collection.ensureIndex(wanted["type"], wanted["fields"], name=wanted["name"], **args)
+            actions.setdefault(name, []).append(f"created {wanted['name']}")
+    return actions
@@ -0,0 +1,43 @@
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+class BatchJournal(object):
+    # write-ahead journal of WriteBuffer batches, one "<crc32> <json>" line each; a torn last line is ignored
+    def __init__(self, path: str, state: Callable[[], Dict]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.state = state
+        self._file = open(self.path, "ab")
+
+    def append(self, payloads: Dict[str, bytes]):
+        # JSONL import bodies become JSON arrays without decoding a document
+        documents = b",".join(b'"%s":[%s]' % (name.encode("utf-8"), bytes(payload).rstrip(b"\n").replace(b"\n", b","))
+                              for name, payload in payloads.items() if payload)
+        record = b'{"state":%s,"documents":{%s}}' % (json.dumps(self.state()).encode("utf-8"), documents)
+        self._file.write(b"%08x " % zlib.crc32(record) + record + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def commit(self):
+        # everything journaled so far is imported and behind the checkpoint
+        self._file.truncate(0)
+
+    def pending(self) -> List[Dict]:
+        # uncommitted batches, oldest first
+        records = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                crc, _, record = line.rstrip(b"\n").partition(b" ")
+                try:
+                    if int(crc, 16) == zlib.crc32(record):
+                        records.append(json.loads(record))
+                except ValueError:
+                    pass
+        return records
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,23 @@
+import hashlib
+
+
+# bump whenever the key functions below change what they hash
+KEY_VERSION = 1
+
+
+def edge_key(*identity) -> str:
+    # from an edge's natural identity, not its contents; the prefix versions the scheme
+    digest = hashlib.blake2b("|".join(str(part) for part in identity).encode("utf-8"), digest_size=16).hexdigest()
+    return f"{KEY_VERSION}-{digest}"
+
+
+def payment_key(txn_hash: str, payee_index: int) -> str:
+    return edge_key(txn_hash, payee_index)
+
+
+def receipt_key(txn_hash: str, witness_gateway: str) -> str:
+    return edge_key(txn_hash, witness_gateway)
+
+
+def reward_key(txn_hash: str, account: str, gateway: str, reward_type: str) -> str:
+    return edge_key(txn_hash, account, gateway, reward_type)
@@ -1,9 +1,13 @@
 import requests
 import os
+import json
+import time
 import h3
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import parse
+from typing import Dict, List, Tuple, Optional, Iterator
 from settings import Settings
 
 
@@ -16,32 +20,88 @@ def geo_index(h):
     return {"type": "Point", "coordinates": [coordinates[1], coordinates[0]]}
 
 
-def process_gateway_inventory(settings: Settings):
+def latest_gateway_inventory(settings: Settings) -> Tuple[str, int]:
+    # only the small index document; the CSV itself is downloaded by process_gateway_inventory
+    url = settings.latest_inventories_url
+    inventories = requests.get(url).json()
+    inventory_url = inventories["gateway_inventory"]
+    inventory_height = int(parse.parse("gateway_inventory_{0}.csv.gz", inventory_url.split("/")[-1])[0])
+    return inventory_url, inventory_height
+
+
+class InventoryFingerprints(object):
+    # 64-bit row hash per hotspot of the last imported inventory row, persisted across restarts
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self.inventory_height: Optional[int] = None
+        self.fingerprints: Dict[str, int] = {}
+
+    def load(self):
+        if self.path and self.path.exists():
+            with open(self.path) as f:
+                state = json.load(f)
+            self.inventory_height = state["inventory_height"]
+            self.fingerprints = state["fingerprints"]
+
+    def save(self):
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump({"inventory_height": self.inventory_height, "fingerprints": self.fingerprints}, f)
+
+    def reset(self):
+        self.inventory_height = None
+        self.fingerprints = {}
+
+
+def decode_locations(locations: pd.Series) -> List[dict]:
+    # batched geo_index for a column with no missing values
+    coordinates = np.array([h3.h3_to_geo(h) for h in locations.to_numpy()], dtype=float).reshape(-1, 2)
+    return [{"type": "Point", "coordinates": [lng, lat]} for lat, lng in coordinates.tolist()]
+
+
+def process_gateway_inventory(inventory_url: str, fingerprints: InventoryFingerprints, chunksize: Optional[int],
+                              stats: Dict) -> Iterator[List[dict]]:
+    # yields import batches of new/changed hotspots one CSV chunk at a time; counts go into `stats`
     gz_path = Path("gateway_inventory_latest.csv.gz")
     csv_path = Path("gateway_inventory_latest.csv")
 
-    url = settings.latest_inventories_url
-    inventories = requests.get(url).json()
+    stats.update({"rows": 0, "chunks": 0, "skipped": 0, "new": 0, "changed": 0, "unchanged": 0, "imported": 0})
+    known = pd.Series(fingerprints.fingerprints, dtype="Int64")
 
-    data = pd.read_csv(inventories["gateway_inventory"])
-    id = data.address.map("hotspots/{}".format)
-    key = data.address
-    location_geo = data.location.map(geo_index)
+    chunks = pd.read_csv(inventory_url, chunksize=chunksize) if chunksize else [pd.read_csv(inventory_url)]
+    for data in chunks:
+        stats["chunks"] += 1
+        stats["rows"] += len(data)
+        # rows with missing values were never imported; mask them out before doing any work on them
+        complete = data.dropna()
+        stats["skipped"] += len(data) - len(complete)
+        data = complete
 
-    data["_id"] = id
-    data["_key"] = key
-    data["location_geo"] = location_geo
+        # hash the raw rows before any derived columns are added, so the fingerprint only moves when the source does
+        row_hashes = pd.util.hash_pandas_object(data, index=False).astype("int64").to_numpy()
+        # nullable Int64 so unknown hotspots come back as <NA> without squeezing the hashes through float64
+        previous = known.reindex(data.address)
+        is_new = previous.isna().to_numpy()
+        changed = is_new | (previous.fillna(0).astype("int64").to_numpy() != row_hashes)
+        stats["new"] += int(is_new.sum())
+        stats["changed"] += int(changed.sum() - is_new.sum())
+        stats["unchanged"] += int(len(data) - changed.sum())
 
-    data = data.dropna()
+        data = data[changed].copy()
+        if data.empty:
+            continue
+        data["_id"] = "hotspots/" + data.address
+        data["_key"] = data.address
+        data["location_geo"] = decode_locations(data.location)
 
-    records = data.to_dict("records")
+        records = data.to_dict("records")
+        yield records
+        # only reached once the caller has imported the batch
+        fingerprints.fingerprints.update(zip(data.address, row_hashes[changed].tolist()))
+        stats["imported"] += len(records)
 
     try:
         os.remove(gz_path)
         os.remove(csv_path)
     except FileNotFoundError:
         pass
-
-    inventory_height = int(parse.parse("gateway_inventory_{0}.csv.gz", inventories["gateway_inventory"].split("/")[-1])[0])
-
-    return records, inventory_height
@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from settings import Settings
+
+
+# seconds; covers everything from a cached RPC (sub-millisecond) to a slow import (tens of seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric(object):
+    # One metric family in the Prometheus text format; samples are kept per tuple of label values.
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        Metric.__init__(self, name, help, labels)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        Metric.__init__(self, name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts, sum, count]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self.values:
+                self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = state = self.values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, n) in self.values.items():
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {n}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+class Registry(object):
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+RPC_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_rpc_seconds", "Latency of JSON-RPC requests to the node (batch = one HTTP request for many calls)",
+    ("method", "batch")))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_parse_seconds", "Time decoding node responses into blocks / transactions", ("kind",)))
+FETCH_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_fetch_seconds", "Time fetching a block and its transactions, including parsing"))
+TRANSFORM_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_transform_seconds", "Time building a block's documents"))
+BLOCK_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_block_seconds", "Wall time syncing one block, from fetch to handing its documents to the write buffer"))
+IMPORT_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_import_seconds", "Time of one importBulk call", ("collection",)))
+DOCUMENTS_WRITTEN = REGISTRY.register(Counter(
+    "helium_etl_documents_written_total", "Documents created by importBulk", ("collection",)))
+DUPLICATES_IGNORED = REGISTRY.register(Counter(
+    "helium_etl_duplicates_ignored_total", "Documents importBulk ignored because their _key already existed",
+    ("collection",)))
+BLOCKS_SKIPPED = REGISTRY.register(Counter(
+    "helium_etl_blocks_skipped_total", "Blocks given up on after the retry limit (recorded in block_index)"))
+CHAIN_BREAKS = REGISTRY.register(Counter(
+    "helium_etl_chain_breaks_total", "Blocks whose prev_hash didn't match the hash stored for the block before them"))
+RETENTION_REMOVED = REGISTRY.register(Counter(
+    "helium_etl_retention_removed_total", "Documents removed by retention passes: edges and block_index entries below "
+                                          "the window (expired) or vertices no edge points at (orphan)",
+    ("collection", "reason")))
+RETENTION_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_retention_seconds", "Time of one retention pass", buckets=DEFAULT_BUCKETS + (120, 300, 600)))
+SEEN_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "helium_etl_seen_cache_lookups_total", "Vertex stubs looked up in the seen cache; hits are dropped before import",
+    ("collection", "result")))
+SEEN_CACHE_EVICTIONS = REGISTRY.register(Counter(
+    "helium_etl_seen_cache_evictions_total", "Keys evicted from the seen cache to stay within SEEN_CACHE_SIZE",
+    ("collection",)))
+SEEN_CACHE_SIZE = REGISTRY.register(Gauge(
+    "helium_etl_seen_cache_size", "Keys held in the seen cache", ("collection",)))
+INVENTORY_ROWS = REGISTRY.register(Counter(
+    "helium_etl_inventory_rows_total", "Gateway inventory rows read, by whether they were new, changed, unchanged or "
+                                       "skipped for missing values", ("outcome",)))
+INVENTORY_CHUNKS = REGISTRY.register(Counter(
+    "helium_etl_inventory_chunks_total", "Gateway inventory CSV chunks read"))
+INVENTORY_IMPORTED = REGISTRY.register(Counter(
+    "helium_etl_inventory_imported_total", "Hotspots imported from gateway inventory dumps"))
+INVENTORY_SECONDS = REGISTRY.register(Histogram(
+    "helium_etl_inventory_sync_seconds", "Time downloading and importing one gateway inventory dump",
+    buckets=DEFAULT_BUCKETS + (120, 300, 600)))
+INVENTORY_HEIGHT = REGISTRY.register(Gauge(
+    "helium_etl_inventory_height", "Height of the last gateway inventory dump synced"))
+SYNC_HEIGHT = REGISTRY.register(Gauge(
+    "helium_etl_sync_height", "Next block height to sync"))
+NODE_HEIGHT = REGISTRY.register(Gauge(
+    "helium_etl_node_height", "Last known height of the node"))
+LAG_BLOCKS = REGISTRY.register(Gauge(
+    "helium_etl_lag_blocks", "Blocks the node has that are not synced yet"))
+
+
+def set_heights(sync_height: Optional[int], height: Optional[int]):
+    # sync_height is the next height to sync, so a follower that is caught up has a lag of 0
+    if sync_height is not None:
+        SYNC_HEIGHT.set(sync_height)
+    if height is not None:
+        NODE_HEIGHT.set(height)
+    if sync_height is not None and height is not None:
+        LAG_BLOCKS.set(max(height - sync_height + 1, 0))
+
+
+class EventLog(object):
+    # Structured log: one JSON object per line with a timestamp and an event name, appended to LOGS_PATH.
+    def __init__(self):
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self, path: Optional[str]):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "a", buffering=1)
+
+    def log(self, event: str, **fields):
+        if self._file is None:
+            return
+        line = json.dumps({"ts": time.time(), "event": event, **fields}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+EVENTS = EventLog()
+
+
+def log_event(event: str, **fields):
+    EVENTS.log(event, **fields)
+
+
+def record_inventory_sync(stats: Dict):
+    # stats as kept in follower_info["inventory_sync"]
+    INVENTORY_HEIGHT.set(stats["inventory_height"])
+    if stats["downloaded"]:
+        for outcome in ("new", "changed", "unchanged", "skipped"):
+            INVENTORY_ROWS.inc(stats[outcome], outcome=outcome)
+        INVENTORY_CHUNKS.inc(stats["chunks"])
+        INVENTORY_IMPORTED.inc(stats["imported"])
+        INVENTORY_SECONDS.observe(stats["seconds"])
+    log_event("inventory_sync", **stats)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def configure(settings: Settings):
+    # opens the structured log and starts the /metrics endpoint once per process
+    global _server
+    if EVENTS._file is None:
+        EVENTS.open(settings.logs_path)
+    if _server is None and settings.metrics_port > 0:
+        try:
+            _server = ThreadingHTTPServer((settings.metrics_host, settings.metrics_port), _MetricsHandler)
+        except OSError as e:
+            # e.g. `etl.py --audit` next to a running follower that already serves this port
+            print(f"Not serving metrics on port {settings.metrics_port}: {e}")
+            return
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        print(f"Serving metrics on http://{settings.metrics_host}:{_server.server_address[1]}/metrics")
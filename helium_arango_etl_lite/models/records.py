@@ -0,0 +1,142 @@
+from typing import List, Optional
+
+
+# PARSE_MODE=fast stand-ins for the pydantic models, with only the fields (and coercions) the transform reads
+
+
+class RecordError(ValueError):
+    # a node response missing a field (or holding one of the wrong type); fast mode's ValidationError
+    pass
+
+
+def parse_record(record: type, raw: dict):
+    try:
+        return record(raw)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RecordError(f"invalid {record.__name__}: {e!r}") from e
+
+
+class BlockTransactionRecord(object):
+    __slots__ = ("hash", "type")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.type: str = raw["type"]
+
+
+class BlockRecord(object):
+    __slots__ = ("hash", "height", "prev_hash", "time", "transactions")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.height: int = raw["height"]
+        self.prev_hash: str = raw["prev_hash"]
+        self.time: int = raw["time"]
+        self.transactions: List[BlockTransactionRecord] = [BlockTransactionRecord(t) for t in raw["transactions"]]
+
+
+class PaymentV1Record(object):
+    __slots__ = ("hash", "amount", "payer", "payee")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.amount: int = raw["amount"]
+        self.payer: str = raw["payer"]
+        self.payee: str = raw["payee"]
+
+
+class PaymentV2PaymentRecord(object):
+    __slots__ = ("amount", "payee")
+
+    def __init__(self, raw: dict):
+        self.amount: int = raw["amount"]
+        self.payee: str = raw["payee"]
+
+
+class PaymentV2Record(object):
+    __slots__ = ("hash", "payer", "payments")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.payer: str = raw["payer"]
+        self.payments: List[PaymentV2PaymentRecord] = [PaymentV2PaymentRecord(p) for p in raw["payments"]]
+
+
+class WitnessRecord(object):
+    __slots__ = ("gateway", "frequency", "datarate", "is_valid", "signal", "snr", "timestamp")
+
+    def __init__(self, raw: dict):
+        self.gateway: str = raw["gateway"]
+        self.frequency: float = float(raw["frequency"])
+        self.datarate: str = raw["datarate"]
+        self.is_valid: Optional[bool] = raw.get("is_valid")
+        self.signal: int = raw["signal"]
+        self.snr: float = float(raw["snr"])
+        self.timestamp: int = raw["timestamp"]
+
+
+class ReceiptRecord(object):
+    __slots__ = ("tx_power", "timestamp")
+
+    def __init__(self, raw: dict):
+        self.tx_power: int = raw["tx_power"]
+        self.timestamp: int = raw["timestamp"]
+
+
+class PathElementRecord(object):
+    __slots__ = ("challengee", "receipt", "witnesses")
+
+    def __init__(self, raw: dict):
+        self.challengee: str = raw["challengee"]
+        self.receipt: Optional[ReceiptRecord] = ReceiptRecord(raw["receipt"]) if raw.get("receipt") else None
+        self.witnesses: List[WitnessRecord] = [WitnessRecord(w) for w in raw["witnesses"]]
+
+
+class PocReceiptsRecord(object):
+    __slots__ = ("path",)
+
+    def __init__(self, raw: dict):
+        self.path: List[PathElementRecord] = [PathElementRecord(p) for p in raw["path"]]
+
+
+class AddGatewayRecord(object):
+    __slots__ = ("hash", "gateway", "owner", "payer")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.gateway: str = raw["gateway"]
+        self.owner: str = raw["owner"]
+        self.payer: str = raw["payer"]
+
+
+class AssertLocationRecord(object):
+    __slots__ = ("hash", "gateway", "owner", "location", "gain", "elevation")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.gateway: str = raw["gateway"]
+        self.owner: str = raw["owner"]
+        self.location: str = raw["location"]
+        # only assert_location_v2 carries gain and elevation
+        self.gain: Optional[int] = raw.get("gain")
+        self.elevation: Optional[int] = raw.get("elevation")
+
+
+class RewardRecord(object):
+    __slots__ = ("account", "gateway", "amount", "type")
+
+    def __init__(self, raw: dict):
+        self.account: str = raw["account"]
+        self.gateway: Optional[str] = raw.get("gateway")
+        self.amount: int = raw["amount"]
+        self.type: str = raw["type"]
+
+
+class RewardsRecord(object):
+    __slots__ = ("hash", "start_epoch", "end_epoch", "rewards")
+
+    def __init__(self, raw: dict):
+        self.hash: str = raw["hash"]
+        self.start_epoch: int = raw["start_epoch"]
+        self.end_epoch: int = raw["end_epoch"]
+        self.rewards: List[RewardRecord] = [RewardRecord(r) for r in raw["rewards"]]
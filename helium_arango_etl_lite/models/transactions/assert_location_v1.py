@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class AssertLocationV1(BaseModel):
+    hash: str
+    gateway: str
+    owner: str
+    payer: str
+    location: str
+    nonce: int
+    staking_fee: int
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class AssertLocationV2(BaseModel):
+    hash: str
+    gateway: str
+    owner: str
+    payer: str
+    location: str
+    nonce: int
+    gain: Optional[int]
+    elevation: Optional[int]
+    staking_fee: int
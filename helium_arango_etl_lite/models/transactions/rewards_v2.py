@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class Reward(BaseModel):
+    account: str
+    gateway: Optional[str]
+    amount: int
+    type: str
+
+
+class RewardsV2(BaseModel):
+    hash: str
+    start_epoch: int
+    end_epoch: int
+    rewards: List[Reward]
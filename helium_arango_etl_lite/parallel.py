@@ -0,0 +1,113 @@
+import multiprocessing
+import signal
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple, Callable, Union
+from pydantic.error_wrappers import ValidationError
+from models.records import RecordError
+from client import BlockchainNodeClient, BlockNotAvailable, TRANSIENT_RPC_ERRORS
+from backoff import Backoff
+from settings import Settings
+from models.block import Block
+from transform import fetch_block_transactions, build_block_documents, merge_documents
+from block_index import index_document
+
+
+# each worker process keeps one client (and its keep-alive session) for its whole lifetime
+_client: Optional[BlockchainNodeClient] = None
+
+
+def _init_worker(settings: Settings):
+    global _client
+    # Ctrl-C reaches the whole process group; the follower drains and closes the pool itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _client = BlockchainNodeClient(settings)
+
+
+def worker_client(settings: Settings) -> BlockchainNodeClient:
+    global _client
+    if _client is None:
+        _client = BlockchainNodeClient(settings)
+    return _client
+
+
+# transform_height result for a block the node can't serve yet; the parent waits and resubmits it
+UNAVAILABLE = "unavailable"
+
+
+def transform_height(height: int, max_retries: int, backoff_min: float,
+                     backoff_max: float) -> Tuple[int, Union[Dict[str, List[dict]], str, None]]:
+    # a whole block inside a worker; None after max_retries of missing / invalid transactions
+    backoff = Backoff(backoff_min, backoff_max)
+    retry = 0
+    while True:
+        try:
+            block, txns, transactions = fetch_block_transactions(_client, height)
+            documents = build_block_documents(block.height, block.time, txns, transactions)
+            documents["block_index"] = [index_document(block)]
+            return height, documents
+        except BlockNotAvailable:
+            return height, UNAVAILABLE
+        except TRANSIENT_RPC_ERRORS as e:
+            print(f"transient error fetching block {height}: {e}...retrying")
+            return height, UNAVAILABLE
+        except (ValidationError, RecordError, AttributeError):
+            retry += 1
+            if retry >= max_retries:
+                return height, None
+            print(f"couldn't find transaction in block {height}...retrying")
+            time.sleep(backoff.next())
+
+
+class ProcessPoolTransformer(object):
+    def __init__(self, settings: Settings, processes: int, shard_fn: Callable):
+        self.settings = settings
+        self.processes = processes
+        # Follower.process_block_parallel, passed in to avoid a circular import
+        self.shard_fn = shard_fn
+        # spawned, not forked: the parent already holds threads, an SQLite handle and pooled connections by now
+        self.pool = multiprocessing.get_context("spawn").Pool(processes, initializer=_init_worker,
+                                                              initargs=(settings,))
+
+    def transform_block(self, block: Block) -> Dict[str, List[dict]]:
+        # contiguous shards merged back in shard order keep documents in the same order as the serial path
+        size = -(-len(block.transactions) // self.processes) or 1
+        shards = [block.transactions[i:i + size] for i in range(0, len(block.transactions), size)] or [[]]
+        outputs = self.pool.starmap(
+            self.shard_fn,
+            [(shard, block.height, block.time, self.settings, {}, i) for i, shard in enumerate(shards)]
+        )
+        return merge_documents(output[i] for i, output in enumerate(outputs))
+
+    def transform_blocks(self, heights: Iterable[int], depth: int, max_retries: int, backoff_min: float,
+                         backoff_max: float, stop: threading.Event) -> Iterator[Tuple[int, Optional[Dict[str, List[dict]]]]]:
+        # yields in height order with at most `depth` blocks in flight; ends early once `stop` is set
+        in_flight = deque()
+        for height in heights:
+            in_flight.append(self.pool.apply_async(transform_height, (height, max_retries, backoff_min, backoff_max)))
+            if len(in_flight) >= depth:
+                result = self._wait(in_flight.popleft(), max_retries, backoff_min, backoff_max, stop)
+                if result is None:
+                    return
+                yield result
+        while in_flight:
+            result = self._wait(in_flight.popleft(), max_retries, backoff_min, backoff_max, stop)
+            if result is None:
+                return
+            yield result
+
+    def _wait(self, pending, max_retries: int, backoff_min: float, backoff_max: float,
+              stop: threading.Event) -> Optional[Tuple[int, Optional[Dict[str, List[dict]]]]]:
+        backoff = Backoff(backoff_min, backoff_max)
+        while True:
+            height, documents = pending.get()
+            if documents != UNAVAILABLE:
+                return height, documents
+            if stop.wait(backoff.next()):
+                return None
+            pending = self.pool.apply_async(transform_height, (height, max_retries, backoff_min, backoff_max))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
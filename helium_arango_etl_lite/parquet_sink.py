@@ -0,0 +1,115 @@
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from settings import Settings
+
+try:
+    # optional: only needed when PARQUET_PATH is set
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def _schemas() -> Dict:
+    # columns mirror the edge records in edges.py
+    return {
+        "poc_receipts": pa.schema([
+            ("_key", pa.string()),
+            ("_from", pa.string()),
+            ("_to", pa.string()),
+            ("hash", pa.string()),
+            ("block", pa.int64()),
+            ("timestamp", pa.int64()),
+            ("frequency", pa.float64()),
+            ("datarate", pa.string()),
+            ("is_valid", pa.bool_()),
+            ("signal", pa.int64()),
+            ("snr", pa.float64()),
+            ("tx_power", pa.int64()),
+            ("processing_time_s", pa.float64())
+        ]),
+        "payments": pa.schema([
+            ("_key", pa.string()),
+            ("_from", pa.string()),
+            ("_to", pa.string()),
+            ("hash", pa.string()),
+            ("block", pa.int64()),
+            ("timestamp", pa.int64()),
+            ("amount", pa.int64())
+        ])
+    }
+
+
+class ParquetSink(object):
+    # WriteBuffer sink writing <path>/<collection>/blocks=<first>-<last>/*.parquet; replays append again, dedupe on _key
+    def __init__(self, path: str, partition_blocks: int, max_bytes: int, max_seconds: float):
+        if pa is None:
+            raise Exception("PARQUET_PATH is set but pyarrow is not installed (pip install pyarrow)")
+        self.path = Path(path)
+        self.partition_blocks = partition_blocks
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.schemas = _schemas()
+        # the collections WriteBuffer keeps documents of for this sink
+        self.collections = list(self.schemas)
+        # collection -> (partition start, writer, tmp path, opened at)
+        self._open: Dict[str, Tuple[int, "pq.ParquetWriter", Path, float]] = {}
+        self.files = 0
+        self.rows = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> Optional["ParquetSink"]:
+        if not settings.parquet_path:
+            return None
+        return cls(settings.parquet_path, settings.parquet_partition_blocks, settings.parquet_file_bytes,
+                   settings.parquet_file_seconds)
+
+    def write(self, documents: Dict[str, List]):
+        for collection, schema in self.schemas.items():
+            docs = documents.get(collection)
+            if not docs:
+                continue
+            partitions: Dict[int, List] = {}
+            for doc in docs:
+                partitions.setdefault(doc["block"] - doc["block"] % self.partition_blocks, []).append(doc)
+            for start in sorted(partitions):
+                writer, tmp_path = self._writer(collection, start, partitions[start][0]["block"])
+                # column by column, so edge records (see edges.Edge) and dicts read the same way
+                columns = {name: [doc.get(name) for doc in partitions[start]] for name in schema.names}
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                self.rows += len(partitions[start])
+            self.roll_if_due()
+
+    def roll_if_due(self):
+        for collection, (_, _, tmp_path, opened_at) in list(self._open.items()):
+            if os.path.getsize(tmp_path) >= self.max_bytes or time.time() - opened_at >= self.max_seconds:
+                self._close(collection)
+
+    def close(self):
+        for collection in list(self._open):
+            self._close(collection)
+
+    def _writer(self, collection: str, start: int, first_block: int) -> Tuple["pq.ParquetWriter", Path]:
+        if collection in self._open and self._open[collection][0] != start:
+            self._close(collection)
+        if collection not in self._open:
+            directory = self.path / collection / f"blocks={start}-{start + self.partition_blocks - 1}"
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = directory / f"part-{first_block}-{int(time.time() * 1000)}.parquet.tmp"
+            writer = pq.ParquetWriter(str(tmp_path), self.schemas[collection], compression="zstd")
+            self._open[collection] = (start, writer, tmp_path, time.time())
+        _, writer, tmp_path, _ = self._open[collection]
+        return writer, tmp_path
+
+    def _close(self, collection: str):
+        _, writer, tmp_path, _ = self._open.pop(collection)
+        writer.close()
+        os.replace(tmp_path, tmp_path.with_suffix(""))
+        self.files += 1
+
+    @property
+    def stats(self) -> Dict:
+        return {"files": self.files, "rows": self.rows, "open": len(self._open)}
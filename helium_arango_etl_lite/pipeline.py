@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+from typing import Optional, Dict, List, Tuple, Any
+from pydantic.error_wrappers import ValidationError
+from models.records import RecordError
+from client import BlockNotAvailable, TRANSIENT_RPC_ERRORS
+from backoff import Backoff
+import metrics
+
+
+# sentinel passed down the queues once a stage has nothing left to hand on
+_DONE = object()
+
+
+class BackfillPipeline(object):
+    # prefetch threads -> transform thread -> calling thread writing, joined by bounded queues
+    def __init__(self, follower, depth: int, workers: int, max_retries: int = 50, retry_delay: float = 10):
+        self.follower = follower
+        self.depth = depth
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._fetched: queue.Queue = queue.Queue(maxsize=depth)
+        self._transformed: queue.Queue = queue.Queue(maxsize=depth)
+        # limits how far the prefetchers may run ahead of the transform stage
+        self._window = threading.Semaphore(depth)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._next_height: Optional[int] = None
+        self._end: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def run(self, start: int, end: int) -> int:
+        # backfills heights [start, end) and returns the next height to sync
+        self._next_height = start
+        self._end = end
+
+        if self.follower.process_pool is not None:
+            # worker processes fetch and transform whole blocks, so there is nothing for prefetch threads to do
+            fetchers = []
+            transformer = threading.Thread(target=self._transform_in_processes, args=(start, end), name="transform",
+                                           daemon=True)
+        else:
+            fetchers = [threading.Thread(target=self._prefetch, name=f"prefetch-{i}", daemon=True)
+                        for i in range(self.workers)]
+            transformer = threading.Thread(target=self._transform, args=(start, end), name="transform", daemon=True)
+        for thread in fetchers + [transformer]:
+            thread.start()
+
+        sync_height = start
+        try:
+            # on shutdown, stop after the block being written; the caller flushes and checkpoints up to it
+            while not self.follower.stopping.is_set():
+                item = self._get(self._transformed)
+                if item is _DONE:
+                    break
+                height, documents, t = item
+                if documents is None:
+                    print(f"Block {height} still had missing or invalid transactions after {self.max_retries} attempts, "
+                          f"skipping...")
+                    metrics.log_event("block_skipped", height=height, attempts=self.max_retries)
+                    self.follower.record_skipped(height)
+                else:
+                    self.follower.maybe_update_gateway_inventory()
+                    self.follower.write_documents(documents)
+                    metrics.log_event("block", height=height, seconds=time.time() - t,
+                                      documents={c: len(d) for c, d in documents.items()})
+                sync_height = height + 1
+                self.follower.sync_height = sync_height
+                self.follower.writer.flush_if_due()
+                metrics.BLOCK_SECONDS.observe(time.time() - t)
+                metrics.set_heights(sync_height, self.follower.height)
+                print(f"Block {height} synced in {time.time() - t} seconds...")
+            self.follower.writer.flush()
+        finally:
+            self._stop.set()
+            for thread in fetchers + [transformer]:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+        return sync_height
+
+    def _claim_height(self) -> Optional[int]:
+        with self._lock:
+            if self._next_height >= self._end:
+                return None
+            height = self._next_height
+            self._next_height += 1
+            return height
+
+    def _prefetch(self):
+        while not self._stop.is_set():
+            if not self._acquire(self._window):
+                return
+            height = self._claim_height()
+            if height is None:
+                self._window.release()
+                return
+            t = time.time()
+            try:
+                fetched = self._fetch(height)
+            except BaseException as e:
+                self._fail(e)
+                return
+            if self._stop.is_set():
+                # interrupted, not given up on: nothing may be recorded as skipped for it
+                return
+            if not self._put(self._fetched, (height, fetched, t)):
+                return
+
+    def _fetch(self, height: int) -> Optional[Tuple]:
+        # same retry policy as Follower.sync_block; None once missing / invalid transactions hit max_retries
+        settings = self.follower.settings
+        backoff = Backoff(settings.retry_backoff_min, min(settings.retry_backoff_max, self.retry_delay))
+        retry = 0
+        while not self._stop.is_set():
+            try:
+                block, txns, transactions = self.follower.fetch_block(height)
+                if any(transaction is None for transaction in transactions):
+                    raise AttributeError(f"missing transaction in block {height}")
+                return block, txns, transactions
+            except BlockNotAvailable:
+                self._stop.wait(backoff.next())
+            except TRANSIENT_RPC_ERRORS as e:
+                print(f"transient error fetching block {height}: {e}...retrying")
+                self._stop.wait(backoff.next())
+            except (ValidationError, RecordError, AttributeError):
+                retry += 1
+                if retry >= self.max_retries:
+                    return None
+                print(f"couldn't find transaction in block {height}...retrying")
+                self._stop.wait(backoff.next())
+        return None
+
+    def _transform(self, start: int, end: int):
+        # prefetchers finish out of order; hold early arrivals until their turn so documents leave in height order
+        pending: Dict[int, Any] = {}
+        height = start
+        try:
+            while height < end:
+                while height not in pending:
+                    item = self._get(self._fetched)
+                    if item is _DONE:
+                        return
+                    pending[item[0]] = item
+                _, fetched, t = pending.pop(height)
+                self._window.release()
+                documents = self.follower.transform_block(*fetched) if fetched is not None else None
+                if not self._put(self._transformed, (height, documents, t)):
+                    return
+                height += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._transformed, _DONE)
+
+    def _transform_in_processes(self, start: int, end: int):
+        try:
+            t = time.time()
+            settings = self.follower.settings
+            results = self.follower.process_pool.transform_blocks(
+                range(start, end), self.depth, self.max_retries, settings.retry_backoff_min,
+                min(settings.retry_backoff_max, self.retry_delay), self._stop
+            )
+            for height, documents in results:
+                if not self._put(self._transformed, (height, documents, t)):
+                    return
+                t = time.time()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._transformed, _DONE)
+
+    def _fail(self, e: BaseException):
+        if self._error is None:
+            self._error = e
+        self._stop.set()
+
+    def _acquire(self, semaphore: threading.Semaphore) -> bool:
+        while not self._stop.is_set():
+            if semaphore.acquire(timeout=0.5):
+                return True
+        return False
+
+    def _get(self, q: queue.Queue):
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._stop.is_set():
+                    return False
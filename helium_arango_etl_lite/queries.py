@@ -0,0 +1,176 @@
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlsplit
+from pyArango.connection import Connection
+from pyArango.database import Database
+from cache import QueryCache
+from settings import Settings
+
+
+# a hotspot's witnesses over the last N blocks, over idx_from_block on poc_receipts
+WITNESSES = """FOR e IN poc_receipts
+                  FILTER e._from == @hotspot AND e.block >= @since
+                  COLLECT witness = e._to
+                  AGGREGATE count = COUNT(1), valid_count = SUM(e.is_valid ? 1 : 0), signal_mean = AVG(e.signal),
+                            snr_mean = AVG(e.snr), first_block = MIN(e.block), last_block = MAX(e.block)
+                  SORT count DESC
+                  RETURN {witness: PARSE_IDENTIFIER(witness).key, count, valid_count,
+                          valid_ratio: valid_count / count, signal_mean, snr_mean, first_block, last_block}"""
+
+# the same over the whole retention window, from witness_links
+WITNESS_LINKS = """FOR l IN witness_links
+                      FILTER l._from == @hotspot
+                      SORT l.count DESC
+                      RETURN {witness: PARSE_IDENTIFIER(l._to).key, count: l.count, valid_count: l.valid_count,
+                              valid_ratio: l.valid_ratio, signal_mean: l.signal_mean, snr_mean: l.snr_mean,
+                              first_block: l.first_block, last_block: l.last_block}"""
+
+# an account's payments per counterparty; `side` picks idx_from_block or idx_to_block on payments
+PAYMENT_FLOW = """FOR p IN payments
+                     FILTER p.@side == @account AND p.block >= @since
+                     COLLECT counterparty = p.@other
+                     AGGREGATE amount = SUM(p.amount), count = COUNT(1), first_block = MIN(p.block),
+                               last_block = MAX(p.block)
+                     SORT amount DESC
+                     RETURN {direction: @direction, account: PARSE_IDENTIFIER(counterparty).key, amount, count,
+                             first_block, last_block}"""
+
+# hotspots within a radius (meters), nearest first; this GEO_DISTANCE form is answered from idx_location_geo
+WITHIN = """FOR h IN hotspots
+               FILTER GEO_DISTANCE(@point, h.location_geo) <= @radius
+               SORT GEO_DISTANCE(@point, h.location_geo)
+               LIMIT @limit
+               RETURN {address: h._key, owner: h.owner, location: h.location,
+                       distance: GEO_DISTANCE(@point, h.location_geo)}"""
+
+
+class GraphQueries(object):
+    # streamed from cursors; results of at most `cache_rows` rows are cached per sync_height
+    def __init__(self, database: Database, batch_size: int, cache: QueryCache, cache_rows: int):
+        self.database = database
+        self.batch_size = batch_size
+        self.cache = cache
+        self.cache_rows = cache_rows
+
+    @staticmethod
+    def from_settings(database: Database, settings: Settings) -> "GraphQueries":
+        return GraphQueries(database, settings.query_batch_size,
+                            QueryCache(settings.query_cache_size, settings.query_cache_seconds),
+                            settings.query_cache_rows)
+
+    def sync_height(self) -> int:
+        # one lookup by key; cheap next to any of the queries, and what keys the cache
+        return self.database["follower_info"].fetchDocument("follower_info", rawResults=True)["sync_height"]
+
+    def hotspot_witnesses(self, address: str, blocks: Optional[int] = None) -> Iterator[Dict]:
+        # most frequent first; without `blocks`, the retention window's witness_links
+        height = self.sync_height()
+        if blocks is None:
+            return self._stream("witness_links", WITNESS_LINKS, {"hotspot": "hotspots/" + address}, height)
+        return self._stream("witnesses", WITNESSES,
+                            {"hotspot": "hotspots/" + address, "since": height - blocks}, height)
+
+    def payment_flow(self, account: str, blocks: int) -> Iterator[Dict]:
+        # outgoing then incoming payments of `account` in the last `blocks` blocks, summed per counterparty
+        height = self.sync_height()
+        return itertools.chain.from_iterable(
+            self._stream("payment_flow", PAYMENT_FLOW,
+                         {"account": "accounts/" + account, "since": height - blocks,
+                          "side": side, "other": other, "direction": direction}, height)
+            for direction, side, other in [("out", "_from", "_to"), ("in", "_to", "_from")])
+
+    def hotspots_within(self, lat: float, lng: float, radius_m: float, limit: int = 1000) -> Iterator[Dict]:
+        height = self.sync_height()
+        point = {"type": "Point", "coordinates": [lng, lat]}
+        return self._stream("within", WITHIN, {"point": point, "radius": radius_m, "limit": limit}, height)
+
+    def _stream(self, name: str, aql: str, bind_vars: Dict, height: int) -> Iterator[Dict]:
+        key = name + json.dumps(bind_vars, sort_keys=True)
+        rows = self.cache.get(key, height)
+        if rows is not None:
+            yield from rows
+            return
+        t = time.time()
+        rows = []
+        for row in self.database.AQLQuery(aql, bindVars=bind_vars, rawResults=True, batchSize=self.batch_size):
+            if rows is not None:
+                rows.append(row)
+                if len(rows) > self.cache_rows:
+                    # too big to keep; stream the rest without holding on to it
+                    rows = None
+            yield row
+        if rows is not None:
+            self.cache.put(key, height, rows)
+        print(f"Query {name} {bind_vars} at height {height} in {time.time() - t:.3f} seconds")
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    # GET /hotspots/<address>/witnesses[?blocks=N]
+    # GET /accounts/<address>/payments?blocks=N
+    # GET /hotspots/within?lat=..&lng=..&radius=..[&limit=N]
+    # GET /cache
+    # NDJSON streamed as the cursor is read; HTTP/1.0, so the response ends when the connection closes
+    queries: Optional[GraphQueries] = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        try:
+            if parts == ["cache"]:
+                run = lambda: iter([self.queries.cache.stats])
+            elif parts == ["hotspots", "within"]:
+                args = (float(params["lat"]), float(params["lng"]), float(params["radius"]),
+                        int(params.get("limit", 1000)))
+                run = lambda: self.queries.hotspots_within(*args)
+            elif len(parts) == 3 and parts[0] == "hotspots" and parts[2] == "witnesses":
+                blocks = int(params["blocks"]) if "blocks" in params else None
+                run = lambda: self.queries.hotspot_witnesses(parts[1], blocks)
+            elif len(parts) == 3 and parts[0] == "accounts" and parts[2] == "payments":
+                blocks = int(params["blocks"])
+                run = lambda: self.queries.payment_flow(parts[1], blocks)
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError) as e:
+            self.send_error(400, f"missing or invalid parameter: {e}")
+            return
+        try:
+            # runs the query, so errors can still get a proper status
+            rows = run()
+            first = next(rows, None)
+        except Exception as e:
+            print(f"Query {self.path} failed: {e}")
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for row in itertools.chain([] if first is None else [first], rows):
+                self.wfile.write(json.dumps(row).encode("utf-8") + b"\n")
+        except Exception as e:
+            # headers are out already; a truncated body is all the client can be told
+            print(f"Query {self.path} failed: {e}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(settings: Settings):
+    # entry point of `etl.py --serve-queries`; only needs Arango, so it can run next to (or away from) the follower
+    connection = Connection(settings.arango_address, settings.arango_username, settings.arango_password,
+                            pool_maxsize=settings.arango_pool_size, timeout=settings.arango_timeout)
+    _QueryHandler.queries = GraphQueries.from_settings(connection[settings.arango_database], settings)
+    server = ThreadingHTTPServer((settings.query_host, settings.query_port), _QueryHandler)
+    server.daemon_threads = True
+    print(f"Serving queries on http://{settings.query_host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
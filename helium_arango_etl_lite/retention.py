@@ -0,0 +1,128 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+from pyArango.database import Database
+from settings import Settings
+from cache import SeenCache
+from witness_links import WitnessLinks
+import metrics
+
+
+# vertex collection -> edge collections whose edges keep its vertices alive
+VERTEX_EDGES = {"accounts": ["payments", "rewards"], "hotspots": ["poc_receipts", "rewards"]}
+EDGES = ["poc_receipts", "payments", "rewards"]
+# pruned by `block` like the edges
+PRUNED = EDGES + ["block_index"]
+
+
+class BufferedVertices(object):
+    # vertex ids of edges still in the write buffer, kept from the orphan sweep until the next checkpoint
+    def __init__(self):
+        self.ids: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def add(self, documents: Dict[str, List]):
+        # caller holds self.lock, across the seen-cache filter that drops these vertices' stubs too
+        for e in EDGES:
+            for edge in documents.get(e, ()):
+                self.ids.add(edge["_from"])
+                self.ids.add(edge["_to"])
+
+    def clear(self):
+        with self.lock:
+            self.ids.clear()
+
+
+class RetentionPruner(object):
+    # batched deletes below the BLOCK_INVENTORY_SIZE window, on its own thread, optionally sweeping orphaned vertices
+    def __init__(self, database: Database, settings: Settings, get_sync_height: Callable[[], int],
+                 seen_caches: Dict[str, SeenCache], witness_links: Optional[WitnessLinks] = None,
+                 buffered: Optional[BufferedVertices] = None):
+        self.database = database
+        self.settings = settings
+        self.get_sync_height = get_sync_height
+        self.seen_caches = seen_caches
+        self.witness_links = witness_links
+        self.buffered = buffered or BufferedVertices()
+        self.last_stats: Dict = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.settings.retention_interval)
+            try:
+                self.prune()
+            except Exception as e:
+                print(f"Retention pass failed, will retry next interval: {e}")
+
+    def prune(self) -> Dict:
+        t = time.time()
+        cutoff = self.get_sync_height() - self.settings.block_inventory_size
+        stats = {"cutoff": cutoff, "removed": {}}
+        for e in PRUNED:
+            stats["removed"][e] = self.delete_edges_before(e, cutoff)
+            metrics.RETENTION_REMOVED.inc(stats["removed"][e], collection=e, reason="expired")
+        if self.witness_links is not None:
+            # pairs that lost receipts are recomputed (or dropped) before their hotspots can be collected below
+            stats["witness_links_refreshed"] = self.witness_links.prune(cutoff)
+        if self.settings.retention_gc_vertices:
+            for v, e in VERTEX_EDGES.items():
+                stats["removed"][v] = self.delete_orphans(v, e)
+                metrics.RETENTION_REMOVED.inc(stats["removed"][v], collection=v, reason="orphan")
+        stats["seconds"] = time.time() - t
+        self.last_stats = stats
+        metrics.RETENTION_SECONDS.observe(stats["seconds"])
+        metrics.log_event("retention", **stats)
+        print(f"Retention pass below block {cutoff} removed {stats['removed']} in {stats['seconds']:.1f} seconds")
+        return stats
+
+    def delete_edges_before(self, collection: str, cutoff: int) -> int:
+        aql = """FOR e IN @@collection
+                    FILTER e.block < @cutoff
+                    LIMIT @batch
+                    REMOVE e IN @@collection
+                    RETURN 1"""
+        bind_vars = {"@collection": collection, "cutoff": cutoff, "batch": self.settings.retention_batch_size}
+        removed = 0
+        while True:
+            n = len(self._all(aql, bind_vars))
+            removed += n
+            if n < self.settings.retention_batch_size:
+                return removed
+
+    def delete_orphans(self, vertices: str, edges: List[str]) -> int:
+        # bare key stubs only; the REMOVE re-checks for edges imported since the first pass
+        unreferenced = " AND ".join(
+            f"""LENGTH(FOR x IN {e} FILTER x._from == v._id LIMIT 1 RETURN 1) == 0
+                        AND LENGTH(FOR x IN {e} FILTER x._to == v._id LIMIT 1 RETURN 1) == 0""" for e in edges)
+        find = f"""FOR v IN @@vertices
+                    FILTER LENGTH(ATTRIBUTES(v, true)) == 0
+                        AND {unreferenced}
+                    RETURN v._key"""
+        orphans = self._all(find, {"@vertices": vertices})
+        cache = self.seen_caches.get(vertices)
+        remove = f"""FOR v IN @@vertices
+                      FILTER v._key IN @keys
+                          AND LENGTH(ATTRIBUTES(v, true)) == 0
+                          AND {unreferenced}
+                      REMOVE v IN @@vertices OPTIONS {{ ignoreErrors: true }}
+                      RETURN 1"""
+        batch_size = self.settings.retention_batch_size
+        removed = 0
+        for i in range(0, len(orphans), batch_size):
+            keys = orphans[i:i + batch_size]
+            # held until the batch is removed, so no block can be filtered against the seen cache meanwhile
+            with self.buffered.lock:
+                if cache is not None:
+                    for key in keys:
+                        cache.discard(key)
+                keys = [key for key in keys if f"{vertices}/{key}" not in self.buffered.ids]
+                removed += len(self._all(remove, {"@vertices": vertices, "keys": keys}))
+        return removed
+
+    def _all(self, aql: str, bind_vars: Dict) -> List:
+        return list(self.database.AQLQuery(aql, bindVars=bind_vars, rawResults=True, batchSize=10000))
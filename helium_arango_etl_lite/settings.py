@@ -11,11 +11,54 @@ class Settings(object):
         self._arango_username = os.getenv('ARANGO_USERNAME')
         self._arango_password = '*****'
         self._arango_database = os.getenv('ARANGO_DATABASE')
+        self._arango_pool_size = os.getenv('ARANGO_POOL_SIZE', '16')
+        self._arango_timeout = os.getenv('ARANGO_TIMEOUT', '120')
         self._gateway_inventory_bootstrap: bool = strtobool(os.getenv('GATEWAY_INVENTORY_BOOTSTRAP'))
         self._gateway_inventory_path = os.getenv('GATEWAY_INVENTORY_PATH')
         self._block_inventory_size = os.getenv('BLOCK_INVENTORY_SIZE')
         self._logs_path = os.getenv('LOGS_PATH')
         self._latest_inventories_url = os.getenv('LATEST_INVENTORIES_URL')
+        self._rpc_concurrency = os.getenv('RPC_CONCURRENCY', '1')
+        self._rpc_batch_size = os.getenv('RPC_BATCH_SIZE', '0')
+        self._rpc_timeout = os.getenv('RPC_TIMEOUT', '30')
+        self._parse_mode = os.getenv('PARSE_MODE', 'strict')
+        self._transaction_types = os.getenv('TRANSACTION_TYPES', '')
+        self._block_cache_path = os.getenv('BLOCK_CACHE_PATH')
+        self._block_cache_max_bytes = os.getenv('BLOCK_CACHE_MAX_BYTES', str(10 * 1024 ** 3))
+        self._node_offline = strtobool(os.getenv('NODE_OFFLINE', 'False'))
+        self._pipeline_depth = os.getenv('PIPELINE_DEPTH', '0')
+        self._prefetch_workers = os.getenv('PREFETCH_WORKERS', '4')
+        self._transform_processes = os.getenv('TRANSFORM_PROCESSES', '0')
+        self._backfill_workers = os.getenv('BACKFILL_WORKERS', '0')
+        self._backfill_range_size = os.getenv('BACKFILL_RANGE_SIZE', '500')
+        self._backfill_lease_seconds = os.getenv('BACKFILL_LEASE_SECONDS', '300')
+        self._write_buffer_documents = os.getenv('WRITE_BUFFER_DOCUMENTS', '10000')
+        self._write_buffer_bytes = os.getenv('WRITE_BUFFER_BYTES', '16777216')
+        self._write_buffer_seconds = os.getenv('WRITE_BUFFER_SECONDS', '2')
+        self._journal_path = os.getenv('JOURNAL_PATH')
+        self._seen_cache_size = os.getenv('SEEN_CACHE_SIZE', '1000000')
+        self._inventory_check_interval = os.getenv('INVENTORY_CHECK_INTERVAL', '600')
+        self._inventory_chunk_size = os.getenv('INVENTORY_CHUNK_SIZE', '50000')
+        self._retention_interval = os.getenv('RETENTION_INTERVAL', '0')
+        self._follow_poll_min = os.getenv('FOLLOW_POLL_MIN', '0.1')
+        self._follow_poll_max = os.getenv('FOLLOW_POLL_MAX', '1')
+        self._retry_backoff_min = os.getenv('RETRY_BACKOFF_MIN', '0.5')
+        self._retry_backoff_max = os.getenv('RETRY_BACKOFF_MAX', '30')
+        self._retention_batch_size = os.getenv('RETENTION_BATCH_SIZE', '10000')
+        self._retention_gc_vertices = strtobool(os.getenv('RETENTION_GC_VERTICES', 'False'))
+        self._metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self._parquet_path = os.getenv('PARQUET_PATH')
+        self._witness_links = strtobool(os.getenv('WITNESS_LINKS', 'True'))
+        self._parquet_partition_blocks = os.getenv('PARQUET_PARTITION_BLOCKS', '10000')
+        self._parquet_file_bytes = os.getenv('PARQUET_FILE_BYTES', str(128 * 1024 ** 2))
+        self._parquet_file_seconds = os.getenv('PARQUET_FILE_SECONDS', '3600')
+        self._metrics_port = os.getenv('METRICS_PORT', '0')
+        self._query_host = os.getenv('QUERY_HOST', '127.0.0.1')
+        self._query_port = os.getenv('QUERY_PORT', '8090')
+        self._query_batch_size = os.getenv('QUERY_BATCH_SIZE', '1000')
+        self._query_cache_size = os.getenv('QUERY_CACHE_SIZE', '1000')
+        self._query_cache_seconds = os.getenv('QUERY_CACHE_SECONDS', '60')
+        self._query_cache_rows = os.getenv('QUERY_CACHE_ROWS', '10000')
 
     @property
     def node_address(self):
@@ -37,6 +80,14 @@ class Settings(object):
     def arango_database(self):
         return self._arango_database
 
+    @property
+    def arango_pool_size(self):
+        return max(int(self._arango_pool_size), 1)
+
+    @property
+    def arango_timeout(self):
+        return float(self._arango_timeout)
+
     @property
     def gateway_inventory_bootstrap(self):
         return self._gateway_inventory_bootstrap
@@ -56,3 +107,167 @@ class Settings(object):
     @property
     def latest_inventories_url(self):
         return self._latest_inventories_url
+
+    @property
+    def rpc_concurrency(self):
+        return max(int(self._rpc_concurrency), 1)
+
+    @property
+    def rpc_batch_size(self):
+        return int(self._rpc_batch_size)
+
+    @property
+    def rpc_timeout(self):
+        return float(self._rpc_timeout)
+
+    @property
+    def parse_mode(self):
+        return self._parse_mode.lower()
+
+    @property
+    def transaction_types(self):
+        return [t.strip() for t in self._transaction_types.split(",") if t.strip()]
+
+    @property
+    def block_cache_path(self):
+        return self._block_cache_path
+
+    @property
+    def block_cache_max_bytes(self):
+        return int(self._block_cache_max_bytes)
+
+    @property
+    def node_offline(self):
+        return self._node_offline
+
+    @property
+    def pipeline_depth(self):
+        return int(self._pipeline_depth)
+
+    @property
+    def prefetch_workers(self):
+        return max(int(self._prefetch_workers), 1)
+
+    @property
+    def transform_processes(self):
+        return int(self._transform_processes)
+
+    @property
+    def backfill_workers(self):
+        return int(self._backfill_workers)
+
+    @property
+    def backfill_range_size(self):
+        return max(int(self._backfill_range_size), 1)
+
+    @property
+    def backfill_lease_seconds(self):
+        return float(self._backfill_lease_seconds)
+
+    @property
+    def write_buffer_documents(self):
+        return int(self._write_buffer_documents)
+
+    @property
+    def write_buffer_bytes(self):
+        return int(self._write_buffer_bytes)
+
+    @property
+    def write_buffer_seconds(self):
+        return float(self._write_buffer_seconds)
+
+    @property
+    def journal_path(self):
+        return self._journal_path
+
+    @property
+    def seen_cache_size(self):
+        return int(self._seen_cache_size)
+
+    @property
+    def inventory_check_interval(self):
+        return float(self._inventory_check_interval)
+
+    @property
+    def inventory_chunk_size(self):
+        return int(self._inventory_chunk_size)
+
+    @property
+    def retention_interval(self):
+        return float(self._retention_interval)
+
+    @property
+    def retention_batch_size(self):
+        return int(self._retention_batch_size)
+
+    @property
+    def retention_gc_vertices(self):
+        return self._retention_gc_vertices
+
+    @property
+    def follow_poll_min(self):
+        return float(self._follow_poll_min)
+
+    @property
+    def follow_poll_max(self):
+        return float(self._follow_poll_max)
+
+    @property
+    def retry_backoff_min(self):
+        return float(self._retry_backoff_min)
+
+    @property
+    def retry_backoff_max(self):
+        return float(self._retry_backoff_max)
+
+    @property
+    def metrics_host(self):
+        return self._metrics_host
+
+    @property
+    def metrics_port(self):
+        return int(self._metrics_port)
+
+    @property
+    def parquet_path(self):
+        return self._parquet_path
+
+    @property
+    def parquet_partition_blocks(self):
+        return int(self._parquet_partition_blocks)
+
+    @property
+    def parquet_file_bytes(self):
+        return int(self._parquet_file_bytes)
+
+    @property
+    def parquet_file_seconds(self):
+        return float(self._parquet_file_seconds)
+
+    @property
+    def witness_links(self):
+        return self._witness_links
+
+    @property
+    def query_host(self):
+        return self._query_host
+
+    @property
+    def query_port(self):
+        return int(self._query_port)
+
+    @property
+    def query_batch_size(self):
+        return int(self._query_batch_size)
+
+    @property
+    def query_cache_size(self):
+        return int(self._query_cache_size)
+
+    @property
+    def query_cache_seconds(self):
+        return float(self._query_cache_seconds)
+
+    @property
+    def query_cache_rows(self):
+        return int(self._query_cache_rows)
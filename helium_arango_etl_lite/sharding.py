@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+from pyArango.database import Database
+from pyArango.theExceptions import AQLQueryError
+from settings import Settings
+
+
+class LeaseLost(Exception):
+    # another worker took over the range after our lease expired
+    pass
+
+
+class RangeLease(object):
+    def __init__(self, document: Dict):
+        self.key = document["_key"]
+        self.start = document["start"]
+        self.end = document["end"]
+        self.checkpoint = document["checkpoint"]
+
+
+class RangeLeases(object):
+    # backfill ranges in follower_info, each with its own checkpoint and a lease taken by compare-and-swap on _rev
+    def __init__(self, database: Database, lease_seconds: float, owner: Optional[str] = None):
+        self.database = database
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+
+    def plan(self, start: int, end: int, size: int) -> int:
+        # continues after any ranges planned earlier; returns the end of the planned heights
+        planned_end = self._all("""FOR r IN follower_info
+                                     FILTER r.type == "backfill_range"
+                                     COLLECT AGGREGATE planned_end = MAX(r.end)
+                                     RETURN planned_end""", {})
+        start = max(start, planned_end[0] or start) if planned_end else start
+        ranges = []
+        s = start
+        while s < end:
+            e = min(s - s % size + size, end)
+            ranges.append({"_key": f"backfill_range_{s}", "type": "backfill_range", "start": s, "end": e,
+                           "checkpoint": s, "owner": None, "lease_expires": 0})
+            s = e
+        if ranges:
+            self.database["follower_info"].importBulk(ranges, onDuplicate="ignore")
+            print(f"Planned {len(ranges)} backfill ranges for blocks {start}-{end - 1}")
+        return max(end, start)
+
+    def acquire(self) -> Optional[RangeLease]:
+        # lowest unfinished range that is free, expired, or already ours
+        while True:
+            now = time.time()
+            try:
+                leased = self._all("""FOR r IN follower_info
+                                        FILTER r.type == "backfill_range" AND r.checkpoint < r.end
+                                            AND (r.owner == null OR r.owner == @owner OR r.lease_expires < @now)
+                                        SORT r.start
+                                        LIMIT 1
+                                        UPDATE {_key: r._key, _rev: r._rev} WITH {owner: @owner, lease_expires: @expires}
+                                            IN follower_info OPTIONS {ignoreRevs: false}
+                                        RETURN NEW""",
+                                   {"owner": self.owner, "now": now, "expires": now + self.lease_seconds})
+            except AQLQueryError as e:
+                # lost the race for that range to another worker
+                print(f"backfill lease conflict, retrying: {e}")
+                continue
+            return RangeLease(leased[0]) if leased else None
+
+    def checkpoint(self, lease: RangeLease, height: int):
+        # records progress and renews the lease; raises LeaseLost if the range has been taken over meanwhile
+        updated = self._all("""FOR r IN follower_info
+                                 FILTER r._key == @key AND r.owner == @owner
+                                 UPDATE r WITH {checkpoint: MAX([r.checkpoint, @height]), lease_expires: @expires}
+                                    IN follower_info
+                                 RETURN NEW._key""",
+                            {"key": lease.key, "owner": self.owner, "height": min(height, lease.end),
+                             "expires": time.time() + self.lease_seconds})
+        if not updated:
+            raise LeaseLost(f"lease on blocks {lease.start}-{lease.end - 1} was taken over by another worker")
+        lease.checkpoint = height
+
+    def pending(self) -> int:
+        return self._all("""FOR r IN follower_info
+                              FILTER r.type == "backfill_range" AND r.checkpoint < r.end
+                              COLLECT WITH COUNT INTO n
+                              RETURN n""", {})[0]
+
+    def lowest_unfinished(self) -> Optional[int]:
+        # checkpoint of the lowest range that isn't done yet; nothing at or above it may count as synced
+        rows = self._all("""FOR r IN follower_info
+                              FILTER r.type == "backfill_range" AND r.checkpoint < r.end
+                              COLLECT AGGREGATE lowest = MIN(r.checkpoint)
+                              RETURN lowest""", {})
+        return rows[0] if rows else None
+
+    def clear(self):
+        self._all("""FOR r IN follower_info
+                       FILTER r.type == "backfill_range" AND r.checkpoint >= r.end
+                       REMOVE r IN follower_info""", {})
+
+    def _all(self, aql: str, bind_vars: Dict) -> List:
+        return list(self.database.AQLQuery(aql, bindVars=bind_vars, rawResults=True, batchSize=10000))
+
+
+class ShardedBackfill(object):
+    # `workers` processes, each running its own Follower over leased ranges
+    def __init__(self, follower, workers: int, worker_fn: Callable[[Settings], None]):
+        self.follower = follower
+        self.workers = workers
+        # Follower.backfill_worker, passed in to avoid a circular import
+        self.worker_fn = worker_fn
+        self.leases = RangeLeases(follower.database, follower.settings.backfill_lease_seconds)
+
+    def run(self, start: int, end: int) -> int:
+        # returns the next height to sync once every range is done
+        t = time.time()
+        end = self.leases.plan(start, end, self.follower.settings.backfill_range_size)
+        # spawned, not forked: the coordinator already runs threads whose locks a child could inherit mid-use
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=self.worker_fn, args=(self.follower.settings,),
+                                     name=f"backfill-{i}") for i in range(self.workers)]
+        for p in processes:
+            p.start()
+        forwarded = False
+        while any(p.is_alive() for p in processes):
+            if self.follower.stopping.is_set() and not forwarded:
+                # each worker drains and checkpoints its range on SIGTERM
+                for p in processes:
+                    p.terminate()
+                forwarded = True
+            processes[0].join(timeout=1)
+        # anything left was held by a worker that died: take it over here once its lease runs out
+        while self.leases.pending() and not self.follower.stopping.is_set():
+            self.follower.work_ranges(self.leases)
+            if self.leases.pending():
+                self.follower.stopping.wait(min(self.leases.lease_seconds / 4, 30))
+        if self.follower.stopping.is_set():
+            print(f"Sharded backfill interrupted, {self.leases.pending()} ranges left for the next start")
+            return start
+        self.leases.clear()
+        print(f"Sharded backfill of blocks {start}-{end - 1} finished in {time.time() - t:.1f} seconds")
+        return end
@@ -0,0 +1,15 @@
+# Run from the helium_arango_etl_lite directory: python -m pytest tests
+import pytest
+
+
+@pytest.fixture
+def offline_env(monkeypatch, tmp_path):
+    # what a Follower needs to run against benchmarks.fake_node and benchmarks.null_arango
+    env = {"ARANGO_DATABASE": "test", "GATEWAY_INVENTORY_PATH": "", "GATEWAY_INVENTORY_BOOTSTRAP": "False",
+           "BLOCK_INVENTORY_SIZE": "7200", "INVENTORY_CHECK_INTERVAL": "1e12", "LOGS_PATH": "", "METRICS_PORT": "0",
+           "JOURNAL_PATH": "", "BLOCK_CACHE_PATH": "", "PARQUET_PATH": "", "RETENTION_INTERVAL": "0",
+           "RETRY_BACKOFF_MIN": "0.001", "RETRY_BACKOFF_MAX": "0.001"}
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.chdir(tmp_path)
+    return monkeypatch
@@ -0,0 +1,36 @@
+import multiprocessing
+import sqlite3
+from blockcache import BlockCache
+
+
+def _write(path: str, worker: int):
+    cache = BlockCache(path, 10 ** 9)
+    for i in range(200):
+        cache.put_many([(f"txn:{worker}-{i}-{j}", None, {"hash": f"{worker}-{i}-{j}"}) for j in range(5)])
+
+
+def test_concurrent_writers_share_the_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    BlockCache(path, 10 ** 9)
+    processes = [multiprocessing.Process(target=_write, args=(path, w)) for w in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert [p.exitcode for p in processes] == [0] * 4
+    cache = BlockCache(path, 10 ** 9)
+    keys = [f"txn:{w}-{i}-{j}" for w in range(4) for i in range(200) for j in range(5)]
+    assert len(cache.get_many(keys)) == len(keys)
+
+
+def test_write_failure_is_not_fatal(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = BlockCache(path, 10 ** 9, busy_timeout=0.1)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        cache.put_many([("block:1", 1, {"height": 1})])
+    finally:
+        other.execute("ROLLBACK")
+    assert cache.get_many(["block:1"]) == {}
+    assert cache.stats["bytes"] == 0
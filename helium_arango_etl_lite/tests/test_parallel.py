@@ -0,0 +1,31 @@
+import threading
+from benchmarks.fake_node import FakeNode
+from benchmarks.fixtures import synthetic_block
+from benchmarks.null_arango import NullConnection
+
+
+def test_process_pool_output_matches_serial(offline_env):
+    block, transactions = synthetic_block(1000, "payment")
+    for transaction in transactions.values():
+        # every payment from the same account, so the block repeats its stub
+        transaction["payer"] = "13payer"
+    node = FakeNode([(block, transactions)]).start()
+    offline_env.setenv("NODE_ADDRESS", node.address)
+    offline_env.setenv("TRANSFORM_PROCESSES", "2")
+    offline_env.setenv("SEEN_CACHE_SIZE", "0")
+    from follower import Follower
+    from settings import Settings
+
+    follower = Follower(settings=Settings(), connection=NullConnection())
+    try:
+        serial = follower.transform_block(*follower.fetch_block(1000))
+        [(height, pooled)] = list(follower.process_pool.transform_blocks([1000], 1, 5, 0.001, 0.001,
+                                                                          threading.Event()))
+        sharded = follower.process_pool.transform_block(follower.fetch_block(1000)[0])
+    finally:
+        follower.close()
+        node.stop()
+    assert [d["_key"] for d in serial["accounts"]].count("13payer") == 1
+    for documents in [pooled, sharded]:
+        assert {c: d for c, d in documents.items() if c != "block_index"} == \
+               {c: d for c, d in serial.items() if c != "block_index"}
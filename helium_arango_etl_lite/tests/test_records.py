@@ -0,0 +1,30 @@
+import pytest
+from benchmarks.fake_node import FakeNode
+from benchmarks.fixtures import synthetic_block
+from benchmarks.null_arango import NullConnection
+from models.records import PaymentV1Record, RecordError, parse_record
+
+
+def test_missing_field_is_a_record_error():
+    with pytest.raises(RecordError):
+        parse_record(PaymentV1Record, {"hash": "x"})
+
+
+def test_fast_mode_skips_block_with_malformed_transaction(offline_env):
+    block, transactions = synthetic_block(1000, "payment")
+    payment = next(t for t in transactions.values() if t["type"] == "payment_v1")
+    del payment["amount"]
+    node = FakeNode([(block, transactions)]).start()
+    offline_env.setenv("NODE_ADDRESS", node.address)
+    offline_env.setenv("PARSE_MODE", "fast")
+    from follower import Follower
+    from settings import Settings
+
+    try:
+        follower = Follower(settings=Settings(), connection=NullConnection())
+        follower.init_database()
+        follower.first_block = follower.sync_height = 1000
+        # retried like a pydantic ValidationError, then skipped instead of killing the follower
+        assert follower.sync_block(1000) is False
+    finally:
+        node.stop()
@@ -0,0 +1,53 @@
+import threading
+from benchmarks.fake_node import FakeNode
+from benchmarks.fixtures import synthetic_block
+from benchmarks.null_arango import NullConnection
+from retention import RetentionPruner
+
+
+class RecordingPruner(RetentionPruner):
+    # finds `orphans` and records what it would remove instead of running AQL
+    def __init__(self, follower, orphans):
+        RetentionPruner.__init__(self, None, follower.settings, lambda: follower.sync_height, follower.seen_caches,
+                                 None, follower.buffered_vertices)
+        self.orphans = orphans
+        self.removed = []
+
+    def _all(self, aql, bind_vars):
+        if "REMOVE" in aql:
+            self.removed.extend(bind_vars["keys"])
+            return [1] * len(bind_vars["keys"])
+        return list(self.orphans)
+
+
+def test_gc_does_not_remove_vertex_of_edge_buffered_on_a_cache_hit(offline_env):
+    node = FakeNode([synthetic_block(1000, "empty")]).start()
+    offline_env.setenv("NODE_ADDRESS", node.address)
+    offline_env.setenv("RETENTION_GC_VERTICES", "True")
+    from follower import Follower
+    from settings import Settings
+
+    try:
+        follower = Follower(settings=Settings(), connection=NullConnection())
+        follower.init_database()
+    finally:
+        node.stop()
+    cache = follower.seen_caches["accounts"]
+    cache.add("a")
+    pruner = RecordingPruner(follower, ["a"])
+    gc = threading.Thread(target=pruner.delete_orphans, args=("accounts", ["payments"]))
+    filter_new = cache.filter_new
+
+    def filter_then_gc(documents):
+        # the stub of "a" is dropped as a cache hit, then the sweep gets its chance before the edge is recorded
+        filtered = filter_new(documents)
+        gc.start()
+        gc.join(timeout=0.5)
+        return filtered
+
+    cache.filter_new = filter_then_gc
+    follower.write_documents({"accounts": [{"_key": "a"}, {"_key": "b"}],
+                              "payments": [{"_key": "p", "_from": "accounts/a", "_to": "accounts/b"}]})
+    gc.join()
+    assert pruner.removed == []
+    assert "accounts/a" in follower.buffered_vertices.ids
@@ -0,0 +1,51 @@
+import hashlib
+import json
+from typing import List, Dict, Tuple, Iterable
+from models.block import Block, BlockTransaction
+from client import BlockNotAvailable
+from transformers import TRANSFORMERS, collections
+# re-exported: the key scheme lives in keys.py so transformers and witness_links can use it without this module
+from keys import KEY_VERSION, edge_key, payment_key, receipt_key
+
+
+def fetch_block_transactions(client, height: int) -> Tuple[Block, List[BlockTransaction], List]:
+    block = client.block_get(height, None)
+    if block is None:
+        raise BlockNotAvailable(height)
+    # only types with an enabled transformer are fetched at all
+    txns = [txn for txn in block.transactions if txn.type in client.transaction_types]
+    transactions = client.transaction_get_many([(txn.hash, txn.type) for txn in txns])
+    return block, txns, transactions
+
+
+def build_block_documents(block_height: int, block_time: int, txns: List[BlockTransaction], transactions: List) -> Dict[str, List[dict]]:
+    # shared by the serial, pipelined and multiprocessing paths
+    documents = {collection: [] for collection in collections()}
+    for txn, transaction in zip(txns, transactions):
+        TRANSFORMERS[txn.type].build(txn, transaction, block_height, block_time, documents)
+    # one document per key, as a sharded block merges down to
+    return merge_documents([documents])
+
+
+def merge_documents(outputs: Iterable[Dict[str, List[dict]]]) -> Dict[str, List[dict]]:
+    # one document per _key, later vertices merged into the first the way onDuplicate="update" would
+    merged = {}
+    seen = {}
+    for output in outputs:
+        for collection, documents in output.items():
+            merged.setdefault(collection, [])
+            keys = seen.setdefault(collection, {})
+            for document in documents:
+                first = keys.get(document["_key"])
+                if first is None:
+                    keys[document["_key"]] = document
+                    merged[collection].append(document)
+                elif isinstance(document, dict) and len(document) > 1:
+                    # edges are immutable records; only vertices carry data that later documents refresh
+                    first.update(document)
+    return merged
+
+
+def get_hash_of_dict(d: dict) -> str:
+    # original content-hash key scheme, kept for comparison in benchmarks/bench_keys.py
+    return hashlib.md5(json.dumps(d, sort_keys=True).encode('utf-8')).hexdigest()
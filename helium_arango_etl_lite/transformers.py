@@ -0,0 +1,140 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from models.block import BlockTransaction
+from models.transactions.payment_v1 import PaymentV1
+from models.transactions.payment_v2 import PaymentV2
+from models.transactions.poc_receipts_v1 import PocReceiptsV1
+from models.transactions.poc_receipts_v2 import PocReceiptsV2
+from models.transactions.add_gateway_v1 import AddGatewayV1
+from models.transactions.assert_location_v1 import AssertLocationV1
+from models.transactions.assert_location_v2 import AssertLocationV2
+from models.transactions.rewards_v2 import RewardsV2
+from models.records import PaymentV1Record, PaymentV2Record, PocReceiptsRecord, AddGatewayRecord, \
+    AssertLocationRecord, RewardsRecord
+from keys import payment_key, receipt_key, reward_key
+from edges import PaymentEdge, ReceiptEdge, RewardEdge
+from loaders import geo_index
+
+
+class Transformer(object):
+    # build(txn, transaction, block_height, block_time, documents) appends to `collections`
+    def __init__(self, type: str, model: BaseModel, record: type, collections: Tuple[str, ...], build: Callable):
+        self.type = type
+        self.model = model
+        self.record = record
+        self.collections = collections
+        self.build = build
+
+
+# transaction type -> Transformer; transactions of any other type are never fetched from the node
+TRANSFORMERS: Dict[str, Transformer] = {}
+
+# ingested when TRANSACTION_TYPES is empty; the other registered types are opt-in
+DEFAULT_TYPES = ["payment_v1", "payment_v2", "poc_receipts_v1", "poc_receipts_v2"]
+
+
+def register(types: List[str], model, record, collections: Tuple[str, ...]):
+    # decorator registering a document builder for one or more transaction types
+    models = model if isinstance(model, list) else [model] * len(types)
+
+    def decorator(build: Callable) -> Callable:
+        for type, m in zip(types, models):
+            TRANSFORMERS[type] = Transformer(type, m, record, collections, build)
+        return build
+    return decorator
+
+
+def collections() -> List[str]:
+    # every collection a registered transformer writes to, in registration order
+    names = []
+    for transformer in TRANSFORMERS.values():
+        names.extend(c for c in transformer.collections if c not in names)
+    return names
+
+
+def enabled_types(names: Optional[List[str]]) -> List[str]:
+    # the TRANSACTION_TYPES setting, or DEFAULT_TYPES if it is empty
+    if not names:
+        return list(DEFAULT_TYPES)
+    unknown = [name for name in names if name not in TRANSFORMERS]
+    if unknown:
+        raise Exception(f"No transformer registered for transaction types: {unknown}")
+    return names
+
+
+@register(["payment_v1"], PaymentV1, PaymentV1Record, ("payments", "accounts"))
+def build_payment_v1(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    documents["accounts"].append({"_key": transaction.payer})
+    documents["accounts"].append({"_key": transaction.payee})
+    documents["payments"].append(PaymentEdge(payment_key(transaction.hash, 0), transaction.payer, transaction.payee,
+                                             transaction.hash, transaction.amount, block_height, block_time))
+
+
+@register(["payment_v2"], PaymentV2, PaymentV2Record, ("payments", "accounts"))
+def build_payment_v2(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    documents["accounts"].append({"_key": transaction.payer})
+    for i, payment in enumerate(transaction.payments):
+        documents["accounts"].append({"_key": payment.payee})
+        documents["payments"].append(PaymentEdge(payment_key(transaction.hash, i), transaction.payer, payment.payee,
+                                                 transaction.hash, payment.amount, block_height, block_time))
+
+
+@register(["poc_receipts_v1", "poc_receipts_v2"], [PocReceiptsV1, PocReceiptsV2], PocReceiptsRecord, ("poc_receipts",))
+def build_poc_receipts(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    challengee = transaction.path[0].challengee
+    for witness in transaction.path[0].witnesses:
+        receipt = ReceiptEdge(receipt_key(txn.hash, witness.gateway), challengee, witness, txn.hash, block_height)
+        try:
+            receipt.tx_power = transaction.path[0].receipt.tx_power
+            receipt.processing_time_s = (witness.timestamp - transaction.path[0].receipt.timestamp) / 1e9
+        except AttributeError:  # some receipts don't have "receipt" field
+            pass
+        documents["poc_receipts"].append(receipt)
+
+
+# hotspot documents are imported with onDuplicate="update" and merge into what the gateway inventory wrote
+
+@register(["add_gateway_v1"], AddGatewayV1, AddGatewayRecord, ("hotspots", "accounts"))
+def build_add_gateway(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    documents["hotspots"].append({
+        "_key": transaction.gateway,
+        "address": transaction.gateway,
+        "owner": transaction.owner,
+        "payer": transaction.payer,
+        "first_block": block_height
+    })
+    documents["accounts"].append({"_key": transaction.owner})
+
+
+@register(["assert_location_v1", "assert_location_v2"], [AssertLocationV1, AssertLocationV2], AssertLocationRecord,
+          ("hotspots",))
+def build_assert_location(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    hotspot_document = {
+        "_key": transaction.gateway,
+        "address": transaction.gateway,
+        "owner": transaction.owner,
+        "location": transaction.location,
+        "location_geo": geo_index(transaction.location),
+        "location_block": block_height
+    }
+    # only assert_location_v2 carries gain and elevation
+    for field in ["gain", "elevation"]:
+        value = getattr(transaction, field, None)
+        if value is not None:
+            hotspot_document[field] = value
+    documents["hotspots"].append(hotspot_document)
+
+
+# rewards_v2 only: nothing here describes rewards_v1 responses, so that type isn't registered (and never fetched)
+@register(["rewards_v2"], RewardsV2, RewardsRecord, ("rewards", "accounts"))
+def build_rewards(txn: BlockTransaction, transaction, block_height: int, block_time: int, documents: Dict):
+    # hotspot -> owner account edges; rewards not earned by a hotspot (securities) have no edge to hang off
+    for reward in transaction.rewards:
+        if not reward.gateway:
+            continue
+        documents["rewards"].append(RewardEdge(
+            reward_key(transaction.hash, reward.account, reward.gateway, reward.type), reward.gateway, reward.account,
+            reward.amount, reward.type, transaction.start_epoch, transaction.end_epoch, transaction.hash, block_height,
+            block_time
+        ))
+        documents["accounts"].append({"_key": reward.account})
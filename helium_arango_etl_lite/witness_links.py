@@ -0,0 +1,167 @@
+from typing import Dict, List, Tuple
+from pyArango.database import Database
+from keys import edge_key
+
+
+# per-pair aggregates recomputed from the raw poc_receipts edges of the link `l`
+RECOMPUTE = """FIRST(
+                    FOR e IN poc_receipts
+                        FILTER e._from == l._from AND e._to == l._to
+                        COLLECT AGGREGATE count = COUNT(1), valid_count = SUM(e.is_valid ? 1 : 0),
+                                          signal_sum = SUM(e.signal), signal_min = MIN(e.signal),
+                                          signal_max = MAX(e.signal), snr_sum = SUM(e.snr), snr_min = MIN(e.snr),
+                                          snr_max = MAX(e.snr), first_block = MIN(e.block), last_block = MAX(e.block)
+                        RETURN {count, valid_count, signal_sum, signal_min, signal_max, snr_sum, snr_min, snr_max,
+                                first_block, last_block}
+                )"""
+
+
+# running aggregates of a stored link OLD after folding in the partial aggregates of l
+MERGED = {
+    "count": "OLD.count + l.count",
+    "valid_count": "OLD.valid_count + l.valid_count",
+    "signal_sum": "OLD.signal_sum + l.signal_sum",
+    "signal_min": "MIN([OLD.signal_min, l.signal_min])",
+    "signal_max": "MAX([OLD.signal_max, l.signal_max])",
+    "snr_sum": "OLD.snr_sum + l.snr_sum",
+    "snr_min": "MIN([OLD.snr_min, l.snr_min])",
+    "snr_max": "MAX([OLD.snr_max, l.snr_max])",
+    "first_block": "MIN([OLD.first_block, l.first_block])",
+    "last_block": "MAX([OLD.last_block, l.last_block])"
+}
+MERGED_OBJECT = "{" + ", ".join(f"{field}: {expression}" for field, expression in MERGED.items()) + "}"
+
+
+def derived(aggregates: Dict[str, str]) -> str:
+    # AQL object with the means and valid ratio readers want, given AQL expressions for the running sums
+    count = aggregates["count"]
+    return f"{{signal_mean: ({aggregates['signal_sum']}) / ({count}), snr_mean: ({aggregates['snr_sum']}) / ({count}), " \
+           f"valid_ratio: ({aggregates['valid_count']}) / ({count})}}"
+
+
+def variable(name: str) -> Dict[str, str]:
+    return {field: f"{name}.{field}" for field in MERGED}
+
+
+def link_key(challengee: str, witness: str) -> str:
+    return edge_key("witness_link", challengee, witness)
+
+
+def summarize_receipts(receipts: List[dict]) -> List[dict]:
+    # partial aggregates per (challengee, witness) pair for one batch of receipt documents
+    links: Dict[Tuple[str, str], dict] = {}
+    for r in receipts:
+        pair = (r["_from"], r["_to"])
+        l = links.get(pair)
+        if l is None:
+            links[pair] = {
+                "_from": r["_from"], "_to": r["_to"], "count": 1, "valid_count": int(bool(r["is_valid"])),
+                "signal_sum": r["signal"], "signal_min": r["signal"], "signal_max": r["signal"],
+                "snr_sum": r["snr"], "snr_min": r["snr"], "snr_max": r["snr"],
+                "first_block": r["block"], "last_block": r["block"]
+            }
+            continue
+        l["count"] += 1
+        l["valid_count"] += int(bool(r["is_valid"]))
+        l["signal_sum"] += r["signal"]
+        l["signal_min"] = min(l["signal_min"], r["signal"])
+        l["signal_max"] = max(l["signal_max"], r["signal"])
+        l["snr_sum"] += r["snr"]
+        l["snr_min"] = min(l["snr_min"], r["snr"])
+        l["snr_max"] = max(l["snr_max"], r["snr"])
+        l["first_block"] = min(l["first_block"], r["block"])
+        l["last_block"] = max(l["last_block"], r["block"])
+    for l in links.values():
+        l["_key"] = link_key(l["_from"][len("hotspots/"):], l["_to"][len("hotspots/"):])
+    return list(links.values())
+
+
+class WitnessLinks(object):
+    # WriteBuffer sink; batches of only newer blocks are merged in, anything else recomputes the pair from raw edges
+    collections = ["poc_receipts"]
+
+    def __init__(self, database: Database, batch_size: int):
+        self.database = database
+        self.batch_size = batch_size
+
+    def write(self, documents: Dict[str, List[dict]]):
+        receipts = documents.get("poc_receipts")
+        if not receipts:
+            return
+        links = summarize_receipts(receipts)
+        for i in range(0, len(links), self.batch_size):
+            self._apply(links[i:i + self.batch_size])
+
+    def roll_if_due(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _apply(self, links: List[dict]):
+        last_blocks = dict(self._all("""FOR k IN @keys
+                                          LET l = DOCUMENT("witness_links", k)
+                                          FILTER l != null
+                                          RETURN [k, l.last_block]""", {"keys": [l["_key"] for l in links]}))
+        newer, replayed = [], []
+        for l in links:
+            if l["_key"] not in last_blocks or l["first_block"] > last_blocks[l["_key"]]:
+                newer.append(l)
+            else:
+                replayed.append(l)
+        if newer:
+            self._all(f"""FOR l IN @links
+                            UPSERT {{_key: l._key}}
+                            INSERT MERGE(l, {derived(variable("l"))})
+                            UPDATE MERGE({MERGED_OBJECT}, {derived(MERGED)})
+                            IN witness_links""", {"links": newer})
+        if replayed:
+            self._recompute(replayed)
+
+    def prune(self, cutoff: int) -> int:
+        # pairs whose oldest receipt was below `cutoff`; returns the number of pairs touched
+        stale = self._all("""FOR l IN witness_links
+                                FILTER l.first_block < @cutoff
+                                RETURN {_key: l._key, _from: l._from, _to: l._to}""", {"cutoff": cutoff})
+        for i in range(0, len(stale), self.batch_size):
+            self._recompute(stale[i:i + self.batch_size])
+        return len(stale)
+
+    def refresh_blocks(self, start: int, end: int) -> int:
+        # e.g. after a sharded backfill; returns the number of pairs refreshed
+        pairs = self.database.AQLQuery("""FOR e IN poc_receipts
+                                            FILTER e.block >= @start AND e.block < @end
+                                            COLLECT from = e._from, to = e._to
+                                            RETURN [from, to]""",
+                                       bindVars={"start": start, "end": end}, rawResults=True,
+                                       batchSize=self.batch_size)
+        batch = []
+        refreshed = 0
+        for _from, _to in pairs:
+            batch.append({"_key": link_key(_from[len("hotspots/"):], _to[len("hotspots/"):]), "_from": _from, "_to": _to})
+            if len(batch) >= self.batch_size:
+                self._recompute(batch)
+                refreshed += len(batch)
+                batch = []
+        if batch:
+            self._recompute(batch)
+            refreshed += len(batch)
+        return refreshed
+
+    def _recompute(self, links: List[dict]):
+        # links only need _key, _from and _to
+        survivors = self._all(f"""FOR l IN @links
+                                    LET agg = {RECOMPUTE}
+                                    FILTER agg != null AND agg.count > 0
+                                    UPSERT {{_key: l._key}}
+                                    INSERT MERGE({{_key: l._key, _from: l._from, _to: l._to}}, agg, {derived(variable("agg"))})
+                                    REPLACE MERGE({{_key: l._key, _from: l._from, _to: l._to}}, agg, {derived(variable("agg"))})
+                                    IN witness_links
+                                    RETURN l._key""", {"links": [{k: l[k] for k in ("_key", "_from", "_to")} for l in links]})
+        gone = list({l["_key"] for l in links} - set(survivors))
+        if gone:
+            self._all("""FOR k IN @keys
+                          REMOVE k IN witness_links OPTIONS { ignoreErrors: true }""", {"keys": gone})
+
+    def _all(self, aql: str, bind_vars: Dict) -> List:
+        return list(self.database.AQLQuery(aql, bindVars=bind_vars, rawResults=True, batchSize=10000))
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, List, Callable, Optional
+from pyArango.collection import Collection
+from pyArango.theExceptions import CreationError
+from edges import encode
+from journal import BatchJournal
+from metrics import IMPORT_SECONDS, DOCUMENTS_WRITTEN, DUPLICATES_IGNORED, log_event
+
+
+class WriteBuffer(object):
+    # buffers serialized documents across blocks; a flush imports every collection, then calls `checkpoint`
+    def __init__(self, collections: Dict[str, Collection], checkpoint: Callable[[], None],
+                 max_documents: int, max_bytes: int, max_latency_s: float, sinks: Optional[List] = None,
+                 on_duplicate: Optional[Dict[str, str]] = None, journal: Optional[BatchJournal] = None):
+        self.collections = collections
+        self.checkpoint = checkpoint
+        self.sinks = sinks or []
+        self.on_duplicate = on_duplicate or {}
+        self.journal = journal
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_latency_s = max_latency_s
+
+        self.kept = {name for sink in self.sinks for name in sink.collections}
+        self.payloads: Dict[str, bytearray] = {name: bytearray() for name in collections}
+        self.counts: Dict[str, int] = {name: 0 for name in collections}
+        self.documents: Dict[str, List] = {name: [] for name in self.kept}
+        self.bytes = 0
+        self.first_added: Optional[float] = None
+
+    def add(self, documents: Dict[str, List]):
+        for name, docs in documents.items():
+            payload = self.payloads[name]
+            size = len(payload)
+            for doc in docs:
+                payload += encode(doc)
+                payload += b"\n"
+            self.bytes += len(payload) - size
+            self.counts[name] += len(docs)
+            if name in self.kept:
+                self.documents[name].extend(docs)
+        if self.first_added is None:
+            self.first_added = time.time()
+
+    @property
+    def due(self) -> bool:
+        if self.first_added is None:
+            return False
+        return (
+            any(count >= self.max_documents for count in self.counts.values())
+            or self.bytes >= self.max_bytes
+            or time.time() - self.first_added >= self.max_latency_s
+        )
+
+    def flush_if_due(self):
+        if self.due:
+            self.flush()
+
+    def flush(self):
+        if self.first_added is None:
+            # nothing new, but let sinks close files that have been open too long while the follower waits
+            for sink in self.sinks:
+                sink.roll_if_due()
+            return
+        t = time.time()
+        if self.journal is not None:
+            self.journal.append(self.payloads)
+        imported = {}
+        for name, payload in self.payloads.items():
+            if payload:
+                with IMPORT_SECONDS.time(collection=name):
+                    result = import_payload(self.collections[name], payload, self.on_duplicate.get(name, "ignore"))
+                DOCUMENTS_WRITTEN.inc(result.get("created", 0), collection=name)
+                DUPLICATES_IGNORED.inc(result.get("ignored", 0), collection=name)
+                imported[name] = {"documents": self.counts[name], "created": result.get("created"),
+                                  "ignored": result.get("ignored"), "updated": result.get("updated")}
+        for sink in self.sinks:
+            sink.write(self.documents)
+        log_event("flush", bytes=self.bytes, seconds=time.time() - t, age=t - self.first_added, collections=imported)
+        self.payloads = {name: bytearray() for name in self.collections}
+        self.counts = {name: 0 for name in self.collections}
+        self.documents = {name: [] for name in self.kept}
+        self.bytes = 0
+        self.first_added = None
+        self.checkpoint()
+        if self.journal is not None:
+            self.journal.commit()
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+        if self.journal is not None:
+            self.journal.close()
+
+
+def import_payload(collection: Collection, payload: bytes, on_duplicate: str) -> Dict:
+    # Collection.importBulk with a body that is already serialized: one JSON document per line (type=documents)
+    r = collection.connection.session.post(f"{collection.database.getURL()}/import", data=bytes(payload),
+                                           params={"collection": collection.name, "type": "documents",
+                                                   "onDuplicate": on_duplicate})
+    data = r.json()
+    if not r.status_code == 201 or data["error"]:
+        raise CreationError(data["errorMessage"], data)
+    return data